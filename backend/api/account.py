@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime
 
-from backend.models.database import get_db
-from backend.models.models import User, Position, Trade, Order, OrderStatus
+from backend.models.database import get_async_db
+from backend.models.models import Trade, Order, OrderSide, OrderType, OrderStatus
 from backend.api.auth import get_current_user
+from backend.api.auth_cache import Principal
+from backend.api.trading import get_matching_engine
+from backend.matching_engine.engine import MatchingEngine
+from backend.matching_engine.ticks import to_cash, from_cash
 from pydantic import BaseModel
 
 # Pydantic Models for API Responses
@@ -15,30 +21,28 @@ class PositionResponse(BaseModel):
     symbol: str
     quantity: int
     average_price: float
+    realized_pnl: float
     unrealized_pnl: float
-    
-    class Config:
-        orm_mode = True
 
 class TradeHistoryResponse(BaseModel):
     symbol: str
     quantity: int
     price: float
     trade_value: float
-    created_at: str
+    created_at: datetime
 
     class Config:
         orm_mode = True
 
 class OrderHistoryResponse(BaseModel):
     symbol: str
-    side: str
-    order_type: str
+    side: OrderSide
+    order_type: OrderType
     quantity: int
     price: Optional[float]
     filled_quantity: int
-    status: str
-    created_at: str
+    status: OrderStatus
+    created_at: datetime
 
     class Config:
         orm_mode = True
@@ -51,36 +55,52 @@ router = APIRouter(
 )
 
 @router.get("/balance", response_model=AccountBalanceResponse, summary="Get Account Balance")
-def get_account_balance(current_user: User = Depends(get_current_user)):
+async def get_account_balance(current_user: Principal = Depends(get_current_user),
+                              matching_engine: MatchingEngine = Depends(get_matching_engine)):
     """
-    Retrieves the current trading balance for the authenticated user.
+    Retrieves the current trading balance for the authenticated user, as held by the engine's ledger.
     """
-    return AccountBalanceResponse(balance=current_user.balance)
+    account = matching_engine.ledger.open_account(current_user.id, to_cash(current_user.balance))
+    return AccountBalanceResponse(balance=from_cash(account.balance))
 
 @router.get("/positions", response_model=List[PositionResponse], summary="Get User Positions")
-def get_user_positions(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_user_positions(current_user: Principal = Depends(get_current_user),
+                             matching_engine: MatchingEngine = Depends(get_matching_engine)):
     """
-    Retrieves all current positions for the authenticated user.
+    Retrieves all current positions for the authenticated user from the engine's ledger.
+    Unrealized P&L is marked against the last traded price.
     """
-    positions = db.query(Position).filter(Position.user_id == current_user.id).all()
-    return positions
+    ledger = matching_engine.ledger
+    account = ledger.open_account(current_user.id, to_cash(current_user.balance))
+    return [
+        PositionResponse(
+            symbol=position.symbol,
+            quantity=position.quantity,
+            average_price=from_cash(position.average_cost),
+            realized_pnl=from_cash(position.realized_pnl),
+            unrealized_pnl=from_cash(position.unrealized_pnl(ledger.last_prices.get(position.symbol)))
+        )
+        for position in account.positions.values()
+    ]
 
 @router.get("/trades", response_model=List[TradeHistoryResponse], summary="Get User Trade History")
-def get_user_trade_history(limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_user_trade_history(limit: int = 100, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_user)):
     """
     Retrieves the trade history for the authenticated user.
     """
-    trades = db.query(Trade).filter(Trade.user_id == current_user.id).order_by(Trade.created_at.desc()).limit(limit).all()
-    return trades
+    trades = await db.execute(
+        select(Trade).where(Trade.user_id == current_user.id).order_by(Trade.created_at.desc()).limit(limit)
+    )
+    return trades.scalars().all()
 
 @router.get("/orders", response_model=List[OrderHistoryResponse], summary="Get User Order History")
-def get_user_orders(status: Optional[OrderStatus] = None, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_user_orders(status: Optional[OrderStatus] = None, limit: int = 100, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_user)):
     """
     Retrieves the order history for the authenticated user, with an option to filter by status.
     """
-    query = db.query(Order).filter(Order.user_id == current_user.id)
+    query = select(Order).where(Order.user_id == current_user.id)
     if status:
-        query = query.filter(Order.status == status)
+        query = query.where(Order.status == status)
     
-    orders = query.order_by(Order.created_at.desc()).limit(limit).all()
-    return orders 
\ No newline at end of file
+    orders = await db.execute(query.order_by(Order.created_at.desc()).limit(limit))
+    return orders.scalars().all() 
\ No newline at end of file
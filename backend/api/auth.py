@@ -1,14 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 from datetime import datetime, timedelta
 import jwt
 
-from backend.models.database import get_db
+from backend.models.database import get_async_db, write_lock
 from backend.models.models import User
+from backend.api.auth_cache import Principal, PrincipalCache
+from backend.api.password_hashing import PasswordHasher
 
 # Pydantic models for request/response
 class UserCreate(BaseModel):
@@ -34,6 +36,11 @@ class UserResponse(BaseModel):
     is_admin: bool
     created_at: datetime
 
+async def _authenticated_principal(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+                                   db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """Dependency for AuthAPI's own routes, which cannot depend on a bound method in the class body"""
+    return await auth_api.get_current_user(credentials, db)
+
 class AuthAPI:
     def __init__(self):
         self.router = APIRouter()
@@ -41,6 +48,8 @@ class AuthAPI:
         self.SECRET_KEY = "cu-quants-exchange-secret-key-change-in-production"
         self.ALGORITHM = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES = 30
+        self.principal_cache = PrincipalCache()
+        self.password_hasher = PasswordHasher()
         
         # Register routes
         self.router.post("/register", response_model=UserResponse)(self.register)
@@ -63,13 +72,13 @@ class AuthAPI:
         encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_jwt
 
-    async def register(self, user_data: UserCreate, db: Session = Depends(get_db)):
+    async def register(self, user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
         """Register a new user"""
         # Check if user exists
-        existing_user = db.query(User).filter(
+        existing_user = (await db.execute(select(User).where(
             (User.username == user_data.username) | 
             (User.email == user_data.email)
-        ).first()
+        ))).scalars().first()
         
         if existing_user:
             raise HTTPException(
@@ -77,8 +86,10 @@ class AuthAPI:
                 detail="Username or email already registered"
             )
         
-        # Create new user
-        hashed_password = generate_password_hash(user_data.password)
+        # Hand the connection back to the pool while hashing runs off the event
+        # loop, so a burst of sign-ups cannot exhaust it
+        await db.close()
+        hashed_password = await self.password_hasher.hash(user_data.password)
         api_key = self.generate_api_key()
         
         new_user = User(
@@ -89,17 +100,20 @@ class AuthAPI:
             balance=1000.0  # Starting balance for CQAF trading
         )
         
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        async with write_lock():
+            db.add(new_user)
+            await db.commit()
+        await db.refresh(new_user)
         
         return new_user
 
-    async def login(self, login_data: UserLogin, db: Session = Depends(get_db)):
+    async def login(self, login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
         """Authenticate user and return token"""
-        user = db.query(User).filter(User.username == login_data.username).first()
+        user = (await db.execute(select(User).where(User.username == login_data.username))).scalars().first()
+        # Same as register: don't hold a pooled connection across the hash check
+        await db.close()
         
-        if not user or not check_password_hash(user.password_hash, login_data.password):
+        if not user or not await self.password_hasher.verify(user.password_hash, login_data.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password",
@@ -119,16 +133,22 @@ class AuthAPI:
 
     async def get_current_user(self, 
                               credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
-                              db: Session = Depends(get_db)) -> User:
-        """Get current user from token or API key"""
+                              db: AsyncSession = Depends(get_async_db)) -> Principal:
+        """Get current user from token or API key, via the principal cache"""
         
         token = credentials.credentials
         
+        principal = self.principal_cache.get(token)
+        if principal is not None:
+            return principal
+        
         # Try API key first
         if token.startswith("cqaf_"):
-            user = db.query(User).filter(User.api_key == token).first()
+            user = (await db.execute(select(User).where(User.api_key == token))).scalars().first()
             if user:
-                return user
+                principal = Principal.from_user(user)
+                self.principal_cache.put(token, principal)
+                return principal
         
         # Try JWT token
         try:
@@ -147,26 +167,34 @@ class AuthAPI:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        user = db.query(User).filter(User.username == username).first()
+        user = (await db.execute(select(User).where(User.username == username))).scalars().first()
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return user
+        principal = Principal.from_user(user)
+        self.principal_cache.put(token, principal, expires_at=payload.get("exp"))
+        return principal
 
-    async def get_current_user_info(self, current_user: User = Depends(get_current_user)):
+    async def get_current_user_info(self, current_user: Principal = Depends(_authenticated_principal),
+                                    db: AsyncSession = Depends(get_async_db)):
         """Get current user information"""
-        return current_user
+        # The cached principal may be behind on balance, so read the row itself
+        return await db.get(User, current_user.id)
 
     async def refresh_api_key(self, 
-                             current_user: User = Depends(get_current_user),
-                             db: Session = Depends(get_db)):
+                             current_user: Principal = Depends(_authenticated_principal),
+                             db: AsyncSession = Depends(get_async_db)):
         """Generate a new API key for the user"""
         new_api_key = self.generate_api_key()
-        current_user.api_key = new_api_key
-        db.commit()
+        async with write_lock():
+            await db.execute(update(User).where(User.id == current_user.id).values(api_key=new_api_key))
+            await db.commit()
+        
+        # The old key (and any cached token) must stop working right away
+        self.principal_cache.invalidate_user(current_user.id)
         
         return {"api_key": new_api_key, "message": "API key refreshed successfully"}
 
@@ -0,0 +1,97 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from backend.models.models import User
+
+class Principal:
+    """The authenticated user as seen by request handlers, detached from any DB session"""
+    __slots__ = ("id", "username", "email", "balance", "is_admin", "created_at", "api_key")
+
+    def __init__(self, id: int, username: str, email: str, balance: float,
+                 is_admin: bool, created_at: Optional[datetime], api_key: Optional[str]):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.balance = balance
+        self.is_admin = is_admin
+        self.created_at = created_at
+        self.api_key = api_key
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.email, user.balance,
+                   bool(user.is_admin), user.created_at, user.api_key)
+
+class PrincipalCache:
+    """Bounded LRU of credentials (API keys and JWTs) that already authenticated.
+
+    A hit skips both the user lookup and JWT signature verification. Entries
+    expire after ``ttl`` seconds, or earlier when the JWT itself expires, and
+    every credential of a user is dropped by ``invalidate_user`` when that
+    user changes. Configured with ``AUTH_CACHE_TTL`` (default 60 seconds) and
+    ``AUTH_CACHE_SIZE`` (default 10000 credentials).
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl if ttl is not None else float(os.getenv("AUTH_CACHE_TTL", "60"))
+        self.max_size = max_size or int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, credential: str) -> Optional[Principal]:
+        entry = self._entries.get(credential)
+        if entry is None:
+            self.misses += 1
+            return None
+        principal, expires_at = entry
+        if self.clock() >= expires_at:
+            self._discard(credential)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(credential)
+        self.hits += 1
+        return principal
+
+    def put(self, credential: str, principal: Principal, expires_at: Optional[float] = None):
+        """Cache a principal; ``expires_at`` is a wall-clock timestamp (e.g. a JWT's exp) that caps the TTL"""
+        if self.ttl <= 0:
+            return
+        lifetime = self.ttl
+        if expires_at is not None:
+            lifetime = min(lifetime, expires_at - time.time())
+            if lifetime <= 0:
+                return
+        self._discard(credential)
+        self._entries[credential] = (principal, self.clock() + lifetime)
+        self._by_user.setdefault(principal.id, set()).add(credential)
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """Forget every cached credential of a user"""
+        for credential in list(self._by_user.get(user_id, ())):
+            self._discard(credential)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _discard(self, credential: str):
+        entry = self._entries.pop(credential, None)
+        if entry is None:
+            return
+        credentials = self._by_user.get(entry[0].id)
+        if credentials is not None:
+            credentials.discard(credential)
+            if not credentials:
+                del self._by_user[entry[0].id]
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-from datetime import datetime, timedelta
-from sqlalchemy.sql import func
+from datetime import datetime, timedelta, timezone
 
-from backend.models.database import get_db
-from backend.models.models import MarketData, Order, Trade, AttendanceRecord, OrderSide, OrderStatus
+from backend.models.database import get_async_db
+from backend.models.models import Candle, AttendanceRecord, OrderSide
+from backend.matching_engine.engine import MatchingEngine
+from backend.matching_engine.market_view import SymbolStats
+from backend.matching_engine.candles import CANDLE_INTERVALS, from_seconds, to_seconds
+from backend.matching_engine.trade_tape import prints_query, print_from_row
+from backend.api.trading import get_matching_engine
 
 # Pydantic models
 class MarketDataResponse(BaseModel):
@@ -29,92 +33,163 @@ class OrderBookEntry(BaseModel):
     orders: int
 
 class OrderBookResponse(BaseModel):
+    symbol: str
+    seq: int
     bids: List[OrderBookEntry]
     asks: List[OrderBookEntry]
+    timestamp: datetime
+
+class CandleResponse(BaseModel):
+    start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    vwap: float
+    trades: int
+    closed: bool
 
 class TradeResponse(BaseModel):
+    id: int
     price: float
     quantity: int
     timestamp: datetime
-    side: OrderSide
-
-    class Config:
-        orm_mode = True
+    side: OrderSide  # the aggressor's side
 
 router = APIRouter(
     prefix="/market",
     tags=["market"],
 )
 
-def create_market_data_response(md: MarketData) -> MarketDataResponse:
-    """Helper function to create MarketDataResponse from MarketData model."""
-    change = md.last_price - md.open_price
-    change_percent = (change / md.open_price) * 100 if md.open_price != 0 else 0
+def create_market_data_response(stats: SymbolStats, engine: MatchingEngine) -> MarketDataResponse:
+    """Helper function to create MarketDataResponse from the engine's market view and live book."""
+    book = engine.books.get(stats.symbol)
+    bid = book.best_bid if book else None
+    ask = book.best_ask if book else None
+    change = stats.last_price - stats.open_price
+    change_percent = (change / stats.open_price) * 100 if stats.open_price != 0 else 0
     return MarketDataResponse(
-        symbol=md.symbol,
-        last_price=md.last_price,
-        bid_price=md.bid_price,
-        ask_price=md.ask_price,
-        volume=md.volume,
-        open_price=md.open_price,
-        high_price=md.high_price,
-        low_price=md.low_price,
-        timestamp=md.timestamp,
+        symbol=stats.symbol,
+        last_price=stats.last_price,
+        bid_price=book.scale.to_price(bid) if bid is not None else None,
+        ask_price=book.scale.to_price(ask) if ask is not None else None,
+        volume=stats.volume,
+        open_price=stats.open_price,
+        high_price=stats.high_price,
+        low_price=stats.low_price,
+        timestamp=stats.timestamp or engine.clock(),
         change=change,
         change_percent=change_percent,
     )
 
 @router.get("/data", response_model=List[MarketDataResponse], summary="Get All Market Data")
-def get_all_market_data(db: Session = Depends(get_db)):
+async def get_all_market_data():
     """
     Retrieves market data for all available symbols.
     """
-    market_data_list = db.query(MarketData).all()
-    if not market_data_list:
-        return []
-    return [create_market_data_response(md) for md in market_data_list]
+    engine = get_matching_engine()
+    return [create_market_data_response(stats, engine) for stats in engine.market.stats.values()]
 
 @router.get("/data/{symbol}", response_model=MarketDataResponse, summary="Get Market Data for a Symbol")
-def get_market_data_for_symbol(symbol: str, db: Session = Depends(get_db)):
+async def get_market_data_for_symbol(symbol: str):
     """
     Retrieves detailed market data for a specific symbol.
     """
-    market_data = db.query(MarketData).filter(MarketData.symbol == symbol.upper()).first()
-    if not market_data:
+    engine = get_matching_engine()
+    stats = engine.market.get(symbol.upper())
+    if stats is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Market data for symbol '{symbol}' not found")
-    return create_market_data_response(market_data)
+    return create_market_data_response(stats, engine)
 
 @router.get("/orderbook/{symbol}", response_model=OrderBookResponse, summary="Get Order Book for a Symbol")
-def get_order_book(symbol: str, db: Session = Depends(get_db)):
+async def get_order_book(symbol: str, depth: Optional[int] = Query(None, ge=1, description="Price levels per side; the whole book if omitted")):
     """
-    Retrieves the order book for a specific symbol, showing current bids and asks.
+    Retrieves the order book for a specific symbol, showing current bids and asks
+    aggregated by price level, straight from the matching engine.
     """
-    active_statuses = [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED]
-    
-    bids_query = db.query(Order.price, func.sum(Order.quantity), func.count(Order.id)).\
-        filter(Order.symbol == symbol.upper(), Order.side == OrderSide.BUY, Order.status.in_(active_statuses)).\
-        group_by(Order.price).order_by(desc(Order.price)).all()
+    engine = get_matching_engine()
+    if not engine.is_listed(symbol):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Symbol '{symbol}' is not listed")
+    snapshot = engine.get_order_book_snapshot(symbol, depth)
 
-    asks_query = db.query(Order.price, func.sum(Order.quantity), func.count(Order.id)).\
-        filter(Order.symbol == symbol.upper(), Order.side == OrderSide.SELL, Order.status.in_(active_statuses)).\
-        group_by(Order.price).order_by(Order.price).all()
+    return OrderBookResponse(
+        symbol=snapshot["symbol"],
+        seq=snapshot["seq"],
+        bids=[OrderBookEntry(price=p, quantity=q, orders=c) for p, q, c in snapshot["bids"]],
+        asks=[OrderBookEntry(price=p, quantity=q, orders=c) for p, q, c in snapshot["asks"]],
+        timestamp=snapshot["timestamp"],
+    )
 
-    bids = [OrderBookEntry(price=p, quantity=q, orders=c) for p, q, c in bids_query]
-    asks = [OrderBookEntry(price=p, quantity=q, orders=c) for p, q, c in asks_query]
-    
-    return OrderBookResponse(bids=bids, asks=asks)
+@router.get("/candles/{symbol}", response_model=List[CandleResponse], summary="Get OHLCV Candles for a Symbol")
+async def get_candles(symbol: str,
+                      interval: str = Query("1m", description="Bar length: " + ", ".join(CANDLE_INTERVALS)),
+                      start: Optional[datetime] = Query(None, description="Earliest bar start (UTC)"),
+                      end: Optional[datetime] = Query(None, description="Latest bar start (UTC)"),
+                      limit: int = Query(500, ge=1, le=5000),
+                      db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieves OHLCV+VWAP bars, oldest first: the latest `limit` bars starting
+    between `start` and `end`. The last bar may still be open.
+    """
+    engine = get_matching_engine()
+    symbol = symbol.upper()
+    if interval not in CANDLE_INTERVALS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown interval '{interval}'; expected one of {', '.join(CANDLE_INTERVALS)}")
+    if not engine.is_listed(symbol):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Symbol '{symbol}' is not listed")
+
+    # Bars are stored with naive UTC start times
+    if start is not None and start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end is not None and end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+
+    query = select(Candle).where(Candle.symbol == symbol, Candle.interval == interval)
+    if start is not None:
+        query = query.where(Candle.start >= start)
+    if end is not None:
+        query = query.where(Candle.start <= end)
+    rows = (await db.execute(query.order_by(desc(Candle.start)).limit(limit))).scalars().all()
+    bars = {
+        row.start: dict(start=row.start, open=row.open, high=row.high, low=row.low, close=row.close,
+                        volume=row.volume, vwap=row.vwap, trades=row.trades)
+        for row in rows
+    }
+
+    # Bars still in memory are newer than, or not yet written to, the table
+    first = to_seconds(start) if start is not None else None
+    last = to_seconds(end) if end is not None else None
+    for bar in engine.candles.recent(symbol, interval):
+        if (first is None or bar.start >= first) and (last is None or bar.start <= last):
+            bars[from_seconds(bar.start)] = dict(start=from_seconds(bar.start), open=bar.open, high=bar.high,
+                                                 low=bar.low, close=bar.close, volume=bar.volume,
+                                                 vwap=bar.vwap, trades=bar.trades)
+
+    now = engine.clock()
+    length = timedelta(seconds=CANDLE_INTERVALS[interval])
+    return [CandleResponse(closed=bar["start"] + length <= now, **bar)
+            for _, bar in sorted(bars.items())[-limit:]]
 
 @router.get("/trades/{symbol}", response_model=List[TradeResponse], summary="Get Recent Trades for a Symbol")
-def get_recent_trades(symbol: str, limit: int = 50, db: Session = Depends(get_db)):
+async def get_recent_trades(symbol: str,
+                            limit: int = Query(50, ge=1, le=1000),
+                            before: Optional[int] = Query(None, description="Only trades with a lower id, for paging"),
+                            db: AsyncSession = Depends(get_async_db)):
     """
-    Retrieves the most recent trades for a specific symbol.
+    Retrieves the most recent trades for a specific symbol, newest first.
+    Served from the engine's trade tape; only trades older than the tape
+    holds are read from the database.
     """
-    trades = db.query(Trade).join(Order, Trade.order_id == Order.id)\
-        .filter(Order.symbol == symbol.upper())\
-        .order_by(desc(Trade.timestamp))\
-        .limit(limit).all()
-        
-    if not trades:
-        return []
-
-    return trades
\ No newline at end of file
+    engine = get_matching_engine()
+    symbol = symbol.upper()
+    prints, complete = engine.tape.recent(symbol, limit, before)
+    if not complete:
+        older = (await db.execute(
+            prints_query(symbol, limit - len(prints), prints[-1].id if prints else before)
+        )).all()
+        prints.extend(print_from_row(symbol, row) for row in older)
+
+    return [TradeResponse(id=p.id, price=p.price, quantity=p.quantity, timestamp=p.timestamp, side=p.side)
+            for p in prints]
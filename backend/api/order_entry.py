@@ -0,0 +1,201 @@
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import ValidationError
+from typing import Dict, List, Optional
+import json
+
+from backend.models.database import AsyncSessionLocal
+from backend.models.models import OrderStatus
+from backend.matching_engine.orders import EngineOrder
+from backend.api.auth import auth_api
+from backend.api.auth_cache import Principal
+from backend.api.trading import CreateOrderRequest, _new_order
+from backend.matching_engine.engine import MatchingEngine
+from backend.matching_engine.trade_tape import Print
+from backend.matching_engine.ticks import to_cash
+from backend.websocket_manager import ClientConnection
+
+async def authenticate(token: Optional[str]) -> Principal:
+    """User behind a JWT or API key, raising HTTPException 401 if there is none"""
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    async with AsyncSessionLocal() as db:
+        return await auth_api.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+def _is_integer(value) -> bool:
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class OrderEntrySession:
+    """Order entry for one authenticated WebSocket connection.
+
+    The client tags every new order with its own ``client_order_id``, unique
+    among the session's live orders, and can cancel or amend by that id (or by
+    the exchange's ``order_id`` for any of the user's open orders). Orders go
+    straight to the matching engine: ids are allocated in memory and the order
+    row is written behind, so there is no database round trip per order.
+
+    Acks, rejects, fills, amendments and cancellations are queued on the same
+    socket as they happen; the engine reports every execution event of the
+    session's orders through ``watch_order``.
+    """
+
+    def __init__(self, connection: ClientConnection, user: Principal, engine: MatchingEngine,
+                 cancel_on_disconnect: bool = False):
+        self.connection = connection
+        self.user = user
+        self.engine = engine
+        self.cancel_on_disconnect = cancel_on_disconnect
+        # Live orders of this session: client order id <-> order id
+        self.order_ids: Dict[str, int] = {}
+        self.client_order_ids: Dict[int, str] = {}
+        # Make sure the engine's ledger knows this user before risk checks read it
+        engine.ledger.open_account(user.id, to_cash(user.balance))
+
+    def send(self, message: dict):
+        self.connection.offer(json.dumps(message))
+
+    def reject(self, request: dict, reason: str):
+        self.send({
+            "type": "reject",
+            "op": request.get("op"),
+            "client_order_id": request.get("client_order_id"),
+            "order_id": request.get("order_id"),
+            "reason": reason
+        })
+
+    async def handle(self, request: dict):
+        op = request.get("op")
+        if op == "new":
+            await self.new_order(request)
+        elif op == "cancel":
+            await self.cancel_order(request)
+        elif op == "amend":
+            await self.amend_order(request)
+        else:
+            self.reject(request, f"Unknown op '{op}'; expected new, cancel or amend.")
+
+    async def new_order(self, request: dict):
+        client_order_id = request.get("client_order_id")
+        if not isinstance(client_order_id, str) or not client_order_id:
+            return self.reject(request, "client_order_id is required.")
+        if client_order_id in self.order_ids:
+            return self.reject(request, f"client_order_id '{client_order_id}' is already in use by a live order.")
+        if isinstance(request.get("quantity"), bool) or isinstance(request.get("price"), bool):
+            # Validation would read true as 1
+            return self.reject(request, "price must be a number and quantity an integer.")
+
+        try:
+            order = _new_order(CreateOrderRequest.model_validate(request), self.user.id, self.engine)
+        except ValidationError as e:
+            return self.reject(request, _validation_message(e))
+        except ValueError as e:
+            return self.reject(request, str(e))
+
+        self.order_ids[client_order_id] = order.id
+        self.client_order_ids[order.id] = client_order_id
+        self.engine.watch_order(order.id, self._on_execution)
+        try:
+            await self.engine.add_order(order, store=True)
+        except ValueError as e:
+            # Another order used up the headroom between the check and acceptance
+            self.engine.unwatch_order(order.id)
+            self._forget(order.id)
+            return self.reject(request, str(e))
+
+    async def cancel_order(self, request: dict):
+        order = self._open_order(request)
+        if order is None:
+            return
+        # Orders entered elsewhere are not watched, so their outcome is reported here
+        watched = order.id in self.client_order_ids
+        if await self.engine.cancel_order(order.id) is None:
+            return self.reject(request, "Order was filled before it could be canceled.")
+        if not watched:
+            self.send(self._report("cancelled", order))
+
+    async def amend_order(self, request: dict):
+        price, quantity = request.get("price"), request.get("quantity")
+        if price is None and quantity is None:
+            return self.reject(request, "Nothing to amend.")
+        if (price is not None and not _is_number(price)) or (quantity is not None and not _is_integer(quantity)):
+            return self.reject(request, "price must be a number and quantity an integer.")
+        order = self._open_order(request)
+        if order is None:
+            return
+        watched = order.id in self.client_order_ids
+        try:
+            if price is not None:
+                price = self.engine.price_scale(order.symbol).to_ticks(price)
+            amended = await self.engine.amend_order(order.id, price=price, quantity=quantity)
+        except ValueError as e:
+            return self.reject(request, str(e))
+        if amended is None:
+            return self.reject(request, "Order was filled before it could be amended.")
+        if not watched:
+            self.send(self._report("amended", order))
+
+    def _open_order(self, request: dict) -> Optional[EngineOrder]:
+        """The user's resting order a cancel or amend refers to, or None after rejecting the request"""
+        if request.get("client_order_id") is not None:
+            order_id = self.order_ids.get(request["client_order_id"])
+            if order_id is None:
+                self.reject(request, "Unknown client_order_id.")
+                return None
+        else:
+            order_id = request.get("order_id")
+            if not _is_integer(order_id):
+                self.reject(request, "client_order_id or order_id is required.")
+                return None
+        order = self.engine.get_order(order_id)
+        if order is None or order.user_id != self.user.id:
+            self.reject(request, "Order is not open.")
+            return None
+        return order
+
+    def _on_execution(self, event: str, order: EngineOrder, trade: Optional[Print]):
+        self.send(self._report(event, order, trade))
+        if event in ("cancelled", "expired") or order.status == OrderStatus.FILLED:
+            self._forget(order.id)
+
+    def _report(self, event: str, order: EngineOrder, trade: Optional[Print] = None) -> dict:
+        report = {
+            "type": "ack" if event == "accepted" else event,
+            "client_order_id": self.client_order_ids.get(order.id),
+            "order_id": order.id,
+            "symbol": order.symbol,
+            "side": order.side.value,
+            "status": order.status.value,
+            "price": self.engine.price_scale(order.symbol).to_price(order.price) if order.price is not None else None,
+            "quantity": order.quantity,
+            "filled_quantity": order.filled_quantity
+        }
+        if trade is not None:
+            report.update({
+                "trade_id": trade.id,
+                "fill_price": trade.price,
+                "fill_quantity": trade.quantity,
+                "timestamp": trade.timestamp.isoformat()
+            })
+        return report
+
+    def _forget(self, order_id: int):
+        client_order_id = self.client_order_ids.pop(order_id, None)
+        if client_order_id is not None:
+            del self.order_ids[client_order_id]
+
+    async def close(self):
+        """Stop reporting to this connection; its orders stay on the book unless ``cancel_on_disconnect``"""
+        order_ids: List[int] = list(self.client_order_ids)
+        for order_id in order_ids:
+            self.engine.unwatch_order(order_id)
+        self.order_ids.clear()
+        self.client_order_ids.clear()
+        if self.cancel_on_disconnect and order_ids:
+            await self.engine.cancel_orders(order_ids)
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Synchronous helpers, for scripts and the executor workers. Every part of the
+# exchange hashes through these so passwords set anywhere can log in.
+def hash_password(password: str) -> str:
+    return generate_password_hash(password)
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+class PasswordHasher:
+    """Runs password hashing off the event loop, with bounded concurrency.
+
+    A scrypt hash takes on the order of 100ms of CPU. Done inline in an async
+    handler, a burst of logins would stall the matching engine and every
+    WebSocket push for as long. Instead, hashes run on a small executor
+    (``HASH_EXECUTOR`` = ``thread`` or ``process``, ``HASH_WORKERS`` workers),
+    and at most ``HASH_MAX_PENDING`` requests may be waiting for it; beyond
+    that, requests are turned away with 503 rather than queueing without bound.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 executor_type: Optional[str] = None):
+        self.workers = workers or int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.max_pending = max_pending or int(os.getenv("HASH_MAX_PENDING", "64"))
+        self.executor_type = executor_type or os.getenv("HASH_EXECUTOR", "thread")
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        return await self._run(verify_password, password_hash, password)
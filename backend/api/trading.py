@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Set
+import os
 
-from backend.models.database import get_db
-from backend.models.models import User, Order, OrderSide, OrderType, OrderStatus
+from backend.models.database import get_async_db
+from backend.models.models import Order, OrderSide, OrderType
 from backend.api.auth import get_current_user
+from backend.api.auth_cache import Principal
 from backend.matching_engine.engine import MatchingEngine
+from backend.matching_engine.orders import EngineOrder, MAX_QUANTITY
+from backend.matching_engine.ticks import to_cash
 
 # Pydantic Models
 class CreateOrderRequest(BaseModel):
@@ -23,10 +28,33 @@ class OrderResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class AmendOrderRequest(BaseModel):
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+
 class CancelOrderResponse(BaseModel):
     order_id: int
     status: str
 
+class BatchOrderRequest(BaseModel):
+    orders: List[CreateOrderRequest]
+
+class BatchOrderResult(BaseModel):
+    id: Optional[int] = None  # None if the order was rejected
+    status: str
+    error: Optional[str] = None
+
+class BatchCancelRequest(BaseModel):
+    order_ids: List[int]
+
+class BatchCancelResult(BaseModel):
+    order_id: int
+    status: str
+    error: Optional[str] = None
+
+# Largest number of orders or cancels accepted in one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+
 # This is a bit of a workaround to allow passing the matching engine
 # instance to the router, as FastAPI dependencies are typically singletons
 # or created per request.
@@ -50,59 +78,229 @@ router = APIRouter(
 @router.post("/orders", response_model=OrderResponse, status_code=status.HTTP_201_CREATED, summary="Create a New Order")
 async def create_order(
     order_req: CreateOrderRequest, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     matching_engine: MatchingEngine = Depends(get_matching_engine)
 ):
     """
-    Creates a new order. For LIMIT orders, a price must be specified.
+    Creates a new order. For LIMIT orders, a price must be specified, on the contract's tick grid.
     """
+    # Make sure the engine's ledger knows this user before risk checks read it
+    matching_engine.ledger.open_account(current_user.id, to_cash(current_user.balance))
+
+    try:
+        new_order = _new_order(order_req, current_user.id, matching_engine)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Add order to matching engine. Its in-memory state is authoritative for the
+    # ack; the order row, fills and status changes reach the database via the
+    # persistence writer.
+    try:
+        await matching_engine.add_order(new_order, store=True)
+    except ValueError as e:
+        # Another order used up the headroom between the check and acceptance
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return new_order
+
+def _new_order(order_req: CreateOrderRequest, user_id: int, matching_engine: MatchingEngine) -> EngineOrder:
+    """Validate an order request and build its pending order, raising ValueError if it is refused"""
     if order_req.order_type == OrderType.LIMIT and order_req.price is None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Price is required for LIMIT orders.")
+        raise ValueError("Price is required for LIMIT orders.")
 
     if order_req.quantity <= 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive.")
+        raise ValueError("Quantity must be positive.")
+    if order_req.quantity > MAX_QUANTITY:
+        raise ValueError(f"Quantity may be at most {MAX_QUANTITY}.")
 
-    # Balance check
-    if order_req.side == OrderSide.BUY:
-        cost = order_req.quantity * order_req.price if order_req.order_type == OrderType.LIMIT else 0
-        if current_user.balance < cost:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance.")
-    
-    new_order = Order(
-        user_id=current_user.id,
+    if not matching_engine.is_listed(order_req.symbol):
+        raise ValueError(f"Symbol '{order_req.symbol}' is not listed.")
+
+    # The engine prices in ticks; a price off the contract's tick grid is refused here
+    price = order_req.price if order_req.order_type == OrderType.LIMIT else None
+    order = EngineOrder(
+        id=None,
+        user_id=user_id,
         symbol=order_req.symbol.upper(),
         side=order_req.side,
         order_type=order_req.order_type,
         quantity=order_req.quantity,
-        price=order_req.price,
-        status=OrderStatus.PENDING
+        price=matching_engine.price_scale(order_req.symbol).to_ticks(price) if price is not None else None
     )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
 
-    # Add order to matching engine
-    await matching_engine.add_order(new_order, db)
-    db.refresh(new_order) # Refresh to get status updates from matching engine
+    # Pre-trade risk (balance net of open orders, per-user limits) runs in memory
+    matching_engine.check_order(order)
+    # Ids come from the engine, which also numbers orders entered over WebSocket
+    order.id = matching_engine.next_order_id()
+    return order
 
-    return new_order
+def _check_batch_size(size: int):
+    if size == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The batch is empty.")
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"A batch may hold at most {MAX_BATCH_SIZE} entries.")
+
+@router.post("/orders/batch", response_model=List[BatchOrderResult], summary="Create a Batch of Orders")
+async def create_orders(
+    batch: BatchOrderRequest,
+    current_user: Principal = Depends(get_current_user),
+    matching_engine: MatchingEngine = Depends(get_matching_engine)
+):
+    """
+    Creates several orders with one request, e.g. to requote a ladder. Each order is
+    validated on its own and rejected ones do not stop the rest; the accepted orders
+    are handed to the matching engine together, in the given sequence, and their rows
+    are written behind. Returns one result per order, in the same sequence.
+    """
+    _check_batch_size(len(batch.orders))
+    matching_engine.ledger.open_account(current_user.id, to_cash(current_user.balance))
+
+    results: List[Optional[BatchOrderResult]] = []
+    orders: List[EngineOrder] = []
+    positions: List[int] = []
+    for order_req in batch.orders:
+        try:
+            orders.append(_new_order(order_req, current_user.id, matching_engine))
+            positions.append(len(results))
+            results.append(None)
+        except ValueError as e:
+            results.append(BatchOrderResult(status="rejected", error=str(e)))
+    if not orders:
+        return results
+
+    errors = await matching_engine.add_orders(orders, store=True)
+    for position, order, error in zip(positions, orders, errors):
+        if error is None:
+            results[position] = BatchOrderResult(id=order.id, status=order.status.value)
+        else:
+            # Used up headroom taken by an earlier order in the batch, or by another request
+            results[position] = BatchOrderResult(status="rejected", error=error)
+
+    return results
+
+async def _not_open(order_ids: List[int], user_id: int, db: AsyncSession,
+                    matching_engine: MatchingEngine) -> Set[int]:
+    """The given ids, none of them resting, that name (or may name) an order of the user.
+
+    Rows are written behind the engine and their status may lag it, so only
+    ownership is read from the database. An id the engine has handed out but
+    that has no row yet belongs to an order still being written, or to one
+    that was rejected, and is taken as not open rather than unknown.
+    """
+    owners = dict((await db.execute(
+        select(Order.id, Order.user_id).where(Order.id.in_(order_ids))
+    )).all())
+    return {
+        order_id for order_id in order_ids
+        if owners.get(order_id) == user_id
+        or (order_id not in owners and 0 < order_id <= matching_engine.last_order_id)
+    }
+
+async def _resting_order_or_error(order_id: int, user_id: int, db: AsyncSession,
+                                  matching_engine: MatchingEngine) -> EngineOrder:
+    """Resting order owned by the user, or the HTTP error explaining why it is not live"""
+    order = matching_engine.get_order(order_id)
+    if order is not None and order.user_id == user_id:
+        return order
+    if order is None and await _not_open([order_id], user_id, db, matching_engine):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order is not open.")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found.")
 
 @router.delete("/orders/{order_id}", response_model=CancelOrderResponse, summary="Cancel an Order")
-def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def cancel_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    matching_engine: MatchingEngine = Depends(get_matching_engine)
+):
     """
-    Cancels an open order.
+    Cancels an open order by removing it from the matching engine's book.
     """
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
-    
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found.")
+    await _resting_order_or_error(order_id, current_user.id, db, matching_engine)
+
+    if await matching_engine.cancel_order(order_id) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order was filled before it could be canceled.")
+
+    return CancelOrderResponse(order_id=order_id, status="canceled")
+
+@router.post("/orders/cancel", response_model=List[BatchCancelResult], summary="Cancel a Batch of Orders")
+async def cancel_orders(
+    batch: BatchCancelRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    matching_engine: MatchingEngine = Depends(get_matching_engine)
+):
+    """
+    Cancels several open orders with one request. Returns one result per distinct order
+    id; ids that are not open orders of the user are reported without affecting the rest.
+    """
+    _check_batch_size(len(batch.order_ids))
+    order_ids = list(dict.fromkeys(batch.order_ids))
+
+    owned = []
+    for order_id in order_ids:
+        order = matching_engine.get_order(order_id)
+        if order is not None and order.user_id == current_user.id:
+            owned.append(order_id)
+    cancelled = dict(zip(owned, await matching_engine.cancel_orders(owned)))
+
+    # One lookup explains every id that was not resting
+    missing = [order_id for order_id in order_ids
+               if order_id not in cancelled and matching_engine.get_order(order_id) is None]
+    not_open = await _not_open(missing, current_user.id, db, matching_engine) if missing else set()
+
+    results = []
+    for order_id in order_ids:
+        if cancelled.get(order_id) is not None:
+            results.append(BatchCancelResult(order_id=order_id, status="canceled"))
+        elif order_id in cancelled:
+            results.append(BatchCancelResult(order_id=order_id, status="rejected",
+                                             error="Order was filled before it could be canceled."))
+        elif order_id in not_open:
+            results.append(BatchCancelResult(order_id=order_id, status="rejected", error="Order is not open."))
+        else:
+            results.append(BatchCancelResult(order_id=order_id, status="rejected", error="Order not found."))
+    return results
+
+@router.delete("/orders", response_model=List[CancelOrderResponse], summary="Cancel All Open Orders")
+async def cancel_all_orders(
+    symbol: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    matching_engine: MatchingEngine = Depends(get_matching_engine)
+):
+    """
+    Cancels every open order of the user, or only those in ``symbol``.
+    """
+    cancelled = await matching_engine.cancel_all(current_user.id, symbol)
+    return [CancelOrderResponse(order_id=order.id, status="canceled") for order in cancelled]
+
+@router.patch("/orders/{order_id}", response_model=OrderResponse, summary="Amend an Order")
+async def amend_order(
+    order_id: int,
+    amend_req: AmendOrderRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    matching_engine: MatchingEngine = Depends(get_matching_engine)
+):
+    """
+    Changes the price and/or total quantity of a resting LIMIT order without canceling it.
+    Reducing the quantity keeps the order's place in the queue.
+    """
+    if amend_req.price is None and amend_req.quantity is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to amend.")
+
+    order = await _resting_order_or_error(order_id, current_user.id, db, matching_engine)
 
-    cancellable_statuses = [OrderStatus.OPEN, OrderStatus.PARTIALLY_FILLED, OrderStatus.PENDING]
-    if order.status not in cancellable_statuses:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Order is in '{order.status.value}' state and cannot be canceled.")
+    try:
+        price = None
+        if amend_req.price is not None:
+            price = matching_engine.price_scale(order.symbol).to_ticks(amend_req.price)
+        amended = await matching_engine.amend_order(order_id, price=price, quantity=amend_req.quantity)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    order.status = OrderStatus.CANCELLED
-    db.commit()
+    if amended is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order was filled before it could be amended.")
 
-    return CancelOrderResponse(order_id=order_id, status="canceled")
\ No newline at end of file
+    return amended
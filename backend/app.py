@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, Response, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -8,17 +8,34 @@ from datetime import datetime
 from typing import List, Optional
 import uvicorn
 
-from backend.models.database import init_db, get_db
+from backend.models.database import (
+    init_db, get_listed_symbols, get_tick_sizes, get_resting_orders, get_last_order_id, get_persisted_seq,
+    set_persisted_seq, SessionLocal, async_engine
+)
 from backend.models.models import User, Order, Trade, Position, MarketData
-from backend.api.auth import router as auth_router
+from backend.api.auth import router as auth_router, auth_api
 from backend.api.market_data import router as market_data_router
 from backend.api.account import router as account_router
-from backend.api.trading import router as trading_router, MatchingEngineSingleton, engine_singleton as trading_engine_singleton
+from backend.api import trading as trading_api
+from backend.api.trading import router as trading_router, MatchingEngineSingleton
+from backend.api.order_entry import OrderEntrySession, authenticate
 from backend.matching_engine.engine import MatchingEngine
-from backend.websocket_manager import ConnectionManager
+from backend.matching_engine.orders import EngineOrder
+from backend.matching_engine.persistence import PersistenceWriter
+from backend.matching_engine.journal import Journal
+from backend.matching_engine.ledger import AccountLedger
+from backend.matching_engine.market_view import MarketView
+from backend.matching_engine.candles import CandleBuilder
+from backend.matching_engine.trade_tape import TradeTape
+from backend.matching_engine.risk import PreTradeRisk
+from backend.websocket_manager import ConnectionManager, parse_channel
 
 # Global instances
 connection_manager = ConnectionManager()
+# Order-entry sockets get their own queues, apart from the market data feed.
+# Execution reports must never be dropped, so a client too slow to read them
+# is always disconnected, whatever policy the market data feed uses.
+order_entry_manager = ConnectionManager(slow_consumer_policy="disconnect")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,12 +44,47 @@ async def lifespan(app: FastAPI):
     print("🚀 CU Quants Exchange started!")
     print("📊 Trading CQAF (CU Quants Attendance Futures)")
     
-    # Start matching engine
-    matching_engine_instance = MatchingEngine()
+    # Engine output is written to the database behind the matching path
+    persistence_writer = PersistenceWriter()
+    await persistence_writer.start()
+    
+    # Balances and positions are held in memory from here on
+    ledger = AccountLedger()
+    ledger.load(SessionLocal)
+    market = MarketView()
+    market.load(SessionLocal)
+    candles = CandleBuilder()
+    candles.load(SessionLocal, datetime.utcnow())
+    tape = TradeTape()
+    tape.load(SessionLocal)
+    
+    # Start matching engine with one book per listed contract
+    journal = Journal()
+    matching_engine_instance = MatchingEngine(get_listed_symbols(), persistence=persistence_writer,
+                                              journal=journal, ledger=ledger, risk=PreTradeRisk(ledger),
+                                              market=market, candles=candles, tape=tape, tick_sizes=get_tick_sizes())
+    matching_engine_instance.last_order_id = get_last_order_id()
+    
+    # Rebuild the books from the last snapshot and journal tail. Without a
+    # journal yet, adopt the resting orders left in the database instead.
+    if journal.is_empty():
+        restored = matching_engine_instance.restore_resting_orders(
+            EngineOrder.from_model(order, matching_engine_instance.price_scale(order.symbol))
+            for order in get_resting_orders() if matching_engine_instance.is_listed(order.symbol)
+        )
+        journal.open()
+        set_persisted_seq(0)
+        await matching_engine_instance.take_snapshot()
+        print(f"♻️ Restored {restored} resting orders from the database")
+    else:
+        persisted_seq = get_persisted_seq()
+        await matching_engine_instance.recover(persisted_seq)
+        if persisted_seq is None:
+            # First start since journal progress was tracked; the writer keeps it from here
+            set_persisted_seq(journal.seq)
     
-    # Set up singleton for trading API
-    global trading_engine_singleton
-    trading_engine_singleton = MatchingEngineSingleton(matching_engine_instance)
+    # Set up singleton for trading API (must be set on the module the dependency reads from)
+    trading_api.engine_singleton = MatchingEngineSingleton(matching_engine_instance)
     
     # Pass connection manager to the engine
     asyncio.create_task(matching_engine_instance.start(connection_manager))
@@ -41,6 +93,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("💤 Exchange shutting down...")
+    await matching_engine_instance.stop()
+    await persistence_writer.flush()
+    await persistence_writer.stop()
+    auth_api.password_hasher.shutdown()
+    await async_engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -79,26 +136,145 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
+async def health_check(response: Response):
+    writer = trading_api.get_matching_engine().persistence
+    if not writer.healthy:
+        # Order entry is suspended until the database accepts writes again
+        response.status_code = 503
     return {
-        "status": "healthy",
+        "status": "healthy" if writer.healthy else "unhealthy",
         "timestamp": datetime.utcnow().isoformat(),
         "matching_engine": "running",
-        "connections": len(connection_manager.active_connections)
+        "persistence": {
+            "healthy": writer.healthy,
+            "queued": writer.queue.qsize(),
+            "failed_writes": writer.failed_writes,
+            "last_error": writer.last_error
+        },
+        "connections": len(connection_manager.active_connections),
+        "order_entry_connections": len(order_entry_manager.active_connections),
+        "ws_messages_dropped": connection_manager.messages_dropped,
+        "ws_slow_disconnects": connection_manager.slow_disconnects
     }
 
+async def _subscribe(websocket: WebSocket, channels: List[str]):
+    """Subscribe a client to channels and send the current state of book and ticker channels"""
+    engine = trading_api.get_matching_engine()
+    subscribed = []
+    for channel in channels:
+        try:
+            kind, symbol, interval = parse_channel(channel)
+            if not engine.is_listed(symbol):
+                raise ValueError(f"Symbol '{symbol}' is not listed.")
+        except ValueError as e:
+            await connection_manager.send(websocket, {"type": "error", "message": str(e)})
+            continue
+        # Queue the current state right after subscribing, with no await in
+        # between, so it reaches the client ahead of every later update
+        subscribed.append(connection_manager.subscribe(websocket, channel))
+        if kind == "book":
+            await connection_manager.send(websocket, engine.get_book_snapshot_message(symbol))
+        elif kind == "ticker":
+            await connection_manager.send(websocket, engine.get_ticker_message(symbol))
+        elif kind == "candles":
+            bar = engine.candles.current(symbol, interval)
+            if bar is not None:
+                await connection_manager.send(websocket, {"type": "candle", "closed": False, **bar.to_dict()})
+    await connection_manager.send(websocket, {"type": "subscribed", "channels": subscribed})
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, symbol: str = "CQAF"):
+async def websocket_endpoint(websocket: WebSocket, symbol: str = "CQAF", channels: Optional[str] = None):
+    """Market data feed. Clients start on ``channels`` (comma-separated; empty
+    for none), or ``trades:<symbol>`` by default, and then send
+    ``{"op": "subscribe" | "unsubscribe", "channels": [...]}`` to change them
+    or ``{"op": "snapshot", "symbol": ...}`` to resynchronise a book."""
     await connection_manager.connect(websocket)
     try:
+        initial = [channel for channel in channels.split(",") if channel] if channels is not None else [f"trades:{symbol}"]
+        await _subscribe(websocket, initial)
         while True:
-            # The server will push updates; this loop keeps the connection open.
-            # In a more advanced implementation, this could handle client messages
-            # for subscriptions to different channels (e.g., trades, orderbook).
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            try:
+                request = json.loads(await websocket.receive_text())
+                op = request["op"]
+                if op == "snapshot":
+                    requested = str(request["symbol"]).upper()
+                else:
+                    requested = list(request["channels"])
+            except (ValueError, KeyError, TypeError):
+                await connection_manager.send(websocket, {
+                    "type": "error",
+                    "message": 'Expected {"op": "subscribe" | "unsubscribe", "channels": [...]} '
+                               'or {"op": "snapshot", "symbol": ...}'
+                })
+                continue
+            if op == "snapshot":
+                engine = trading_api.get_matching_engine()
+                if engine.is_listed(requested):
+                    await connection_manager.send(websocket, engine.get_book_snapshot_message(requested))
+                else:
+                    await connection_manager.send(websocket, {
+                        "type": "error", "message": f"Symbol '{requested}' is not listed."
+                    })
+            elif op == "subscribe":
+                await _subscribe(websocket, requested)
+            elif op == "unsubscribe":
+                removed = []
+                for channel in requested:
+                    try:
+                        removed.append(connection_manager.unsubscribe(websocket, channel))
+                    except ValueError as e:
+                        await connection_manager.send(websocket, {"type": "error", "message": str(e)})
+                await connection_manager.send(websocket, {"type": "unsubscribed", "channels": removed})
+            else:
+                await connection_manager.send(websocket, {"type": "error", "message": f"Unknown op '{op}'"})
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager already closed the socket (slow consumer)
+        pass
+    finally:
         connection_manager.disconnect(websocket)
 
+@app.websocket("/ws/orders")
+async def order_entry_endpoint(websocket: WebSocket, cancel_on_disconnect: bool = False):
+    """Order entry. The client authenticates once, with an ``Authorization: Bearer``
+    header or a first message ``{"op": "auth", "token": ...}`` (JWT or API key), then
+    sends ``new``, ``cancel`` and ``amend`` messages tagged with its own
+    ``client_order_id``. Acks, rejects and fills come back on the same socket."""
+    connection = await order_entry_manager.connect(websocket)
+    session = None
+    try:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            try:
+                request = json.loads(await websocket.receive_text())
+                token = request["token"] if request.get("op") == "auth" else None
+            except (ValueError, KeyError, TypeError, AttributeError):
+                token = None
+        try:
+            user = await authenticate(token)
+        except HTTPException:
+            # Sent directly: closing the connection discards its queue
+            await websocket.send_text(json.dumps({"type": "error", "message": "Authentication failed"}))
+            await websocket.close(code=1008, reason="authentication failed")
+            return
+        
+        session = OrderEntrySession(connection, user, trading_api.get_matching_engine(), cancel_on_disconnect)
+        session.send({"type": "authenticated", "user_id": user.id, "cancel_on_disconnect": cancel_on_disconnect})
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+                if not isinstance(request, dict):
+                    raise ValueError
+            except ValueError:
+                session.send({"type": "error", "message": "Expected a JSON object with an op"})
+                continue
+            await session.handle(request)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        order_entry_manager.disconnect(websocket)
+        if session is not None:
+            await session.close()
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
@@ -0,0 +1,147 @@
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.models.models import Candle
+
+# Bar intervals and their length in seconds
+CANDLE_INTERVALS: Dict[str, int] = {"1s": 1, "1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+_EPOCH = datetime(1970, 1, 1)
+
+def to_seconds(timestamp: datetime) -> int:
+    """Whole seconds since the epoch of a naive UTC timestamp"""
+    return int((timestamp - _EPOCH).total_seconds())
+
+def from_seconds(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+class Bar:
+    """OHLCV bar for one symbol and interval, with the traded value for VWAP"""
+    __slots__ = ("symbol", "interval", "start", "end", "open", "high", "low", "close", "volume", "value", "trades")
+
+    def __init__(self, symbol: str, interval: str, start: int, price: float):
+        self.symbol = symbol
+        self.interval = interval
+        self.start = start
+        self.end = start + CANDLE_INTERVALS[interval]
+        self.open = self.high = self.low = self.close = price
+        self.volume = 0
+        self.value = 0.0
+        self.trades = 0
+
+    def apply(self, quantity: int, price: float):
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += quantity
+        self.value += quantity * price
+        self.trades += 1
+
+    @classmethod
+    def from_row(cls, row: Candle) -> "Bar":
+        bar = cls(row.symbol, row.interval, to_seconds(row.start), row.open)
+        bar.high, bar.low, bar.close = row.high, row.low, row.close
+        bar.volume = row.volume or 0
+        bar.value = row.vwap * bar.volume
+        bar.trades = row.trades or 0
+        return bar
+
+    @property
+    def vwap(self) -> float:
+        return self.value / self.volume if self.volume else self.close
+
+    def to_dict(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "interval": self.interval,
+            "start": from_seconds(self.start).isoformat(),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+            "vwap": self.vwap,
+            "trades": self.trades,
+        }
+
+class CandleBuilder:
+    """Incremental OHLCV+VWAP bars for every symbol and interval, fed by fills.
+
+    Each fill updates the open bar of every interval in O(1). A bar closes when
+    a fill lands past its end, or when ``close_due`` is called after its end
+    time, so quiet symbols still close their bars. The last ``history`` closed
+    bars per symbol and interval are kept in memory (``CANDLE_HISTORY``,
+    default 500) so recent ranges can be served before the write-behind
+    persistence has stored them.
+
+    Open bars are written when the exchange shuts down; ``load`` picks up
+    the ones whose interval is still running after a restart, so a bar keeps
+    counting across it.
+    """
+
+    def __init__(self, history: Optional[int] = None):
+        self.history = history or int(os.getenv("CANDLE_HISTORY", "500"))
+        self.open_bars: Dict[Tuple[str, str], Bar] = {}
+        self.closed: Dict[Tuple[str, str], Deque[Bar]] = {}
+
+    def load(self, session_factory: Callable[[], Session], now: datetime):
+        """Resume the stored bars whose interval contains ``now``"""
+        seconds = to_seconds(now)
+        db = session_factory()
+        try:
+            for interval, length in CANDLE_INTERVALS.items():
+                start = from_seconds(seconds - seconds % length)
+                for row in db.query(Candle).filter(Candle.interval == interval, Candle.start == start):
+                    self.open_bars[(row.symbol, interval)] = Bar.from_row(row)
+        finally:
+            db.close()
+
+    def record_fill(self, symbol: str, quantity: int, price: float, timestamp: datetime) -> List[Bar]:
+        """Apply a fill to every interval; returns the bars it closed"""
+        seconds = to_seconds(timestamp)
+        closed = []
+        for interval, length in CANDLE_INTERVALS.items():
+            key = (symbol, interval)
+            bar = self.open_bars.get(key)
+            if bar is None or seconds >= bar.end:
+                if bar is not None:
+                    self._close(key, bar)
+                    closed.append(bar)
+                bar = Bar(symbol, interval, seconds - seconds % length, price)
+                self.open_bars[key] = bar
+            bar.apply(quantity, price)
+        return closed
+
+    def close_due(self, now: datetime) -> List[Bar]:
+        """Close every open bar whose interval has ended by ``now``"""
+        seconds = to_seconds(now)
+        closed = []
+        for key, bar in list(self.open_bars.items()):
+            if seconds >= bar.end:
+                del self.open_bars[key]
+                self._close(key, bar)
+                closed.append(bar)
+        return closed
+
+    def _close(self, key: Tuple[str, str], bar: Bar):
+        bars = self.closed.get(key)
+        if bars is None:
+            bars = deque(maxlen=self.history)
+            self.closed[key] = bars
+        bars.append(bar)
+
+    def current(self, symbol: str, interval: str) -> Optional[Bar]:
+        return self.open_bars.get((symbol, interval))
+
+    def recent(self, symbol: str, interval: str) -> Iterator[Bar]:
+        """Closed bars still held in memory, oldest first, then the open bar"""
+        yield from self.closed.get((symbol, interval), ())
+        bar = self.open_bars.get((symbol, interval))
+        if bar is not None:
+            yield bar
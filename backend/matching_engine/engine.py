@@ -1,50 +1,557 @@
 import asyncio
-from typing import List, Dict, Optional
-from sqlalchemy.orm import Session
+import contextlib
+import os
+from typing import AsyncIterator, Callable, Iterable, List, Dict, Optional, Set
 from datetime import datetime
 import json
 
-from backend.models.models import Order, Trade, Position, User, MarketData, OrderSide, OrderType, OrderStatus
+from backend.models.models import OrderSide, OrderType, OrderStatus
+from backend.matching_engine.orders import EngineOrder, MAX_QUANTITY
+from backend.matching_engine.order_book import OrderBook, Level
+from backend.matching_engine.ticks import DEFAULT_TICK_SIZE, TickScale, from_cash
+from backend.matching_engine.persistence import (
+    PersistenceWriter, PersistenceEvent, NewOrder, Fill, OrderUpdate, AccountUpdate, PositionUpdate, CandleUpdate
+)
+from backend.matching_engine.ledger import AccountLedger
+from backend.matching_engine.market_view import MarketView
+from backend.matching_engine.candles import CANDLE_INTERVALS, Bar, CandleBuilder, from_seconds
+from backend.matching_engine.trade_tape import Print, TradeTape
+from backend.matching_engine.risk import PreTradeRisk
+from backend.matching_engine.journal import Journal, NewOrderRecord, CancelRecord, AmendRecord
+
+DEFAULT_SYMBOLS = ["CQAF"]
+
+# Called with an event ("accepted", "fill", "amended", "cancelled" or "expired"),
+# the order, and for fills the print
+ExecutionListener = Callable[[str, EngineOrder, Optional[Print]], None]
+
+def _to_price(scale: TickScale, ticks: Optional[int]) -> Optional[float]:
+    return scale.to_price(ticks) if ticks is not None else None
+
+def _to_prices(scale: TickScale, levels: List[Level]) -> List[tuple]:
+    return [(scale.to_price(price), quantity, count) for price, quantity, count in levels]
 
 class MatchingEngine:
-    def __init__(self):
-        self.buy_orders: List[Order] = []  # Sorted by price (highest first)
-        self.sell_orders: List[Order] = []  # Sorted by price (lowest first)
+    """Matches orders across a registry of independent per-symbol order books.
+
+    Each book has its own lock, so while one symbol is sending market data,
+    orders for other symbols keep matching. Matching itself never awaits: an
+    input's persistence events and market data messages are collected while
+    it runs, the events are committed as one unit together with the journal
+    sequence number they cover, and only then are the messages sent. The
+    database therefore always stops at an input boundary of the journal.
+
+    The engine has no database or wall-clock dependency of its own: output
+    goes to ``persistence`` (see InMemoryPersistence for the interface), time
+    comes from ``clock``, and ``verbose=False`` silences per-order logging.
+    That lets the replay harness drive the exact same matching logic offline.
+
+    Fills are applied to ``ledger`` synchronously, so balances and positions
+    are current the moment a trade happens; the database catches up through
+    the persistence pipeline. When ``risk`` is attached, every order is
+    checked against it inside the book lock and resting orders hold
+    reservations that are released as they fill or are cancelled. Market
+    statistics for the read-only endpoints are kept in ``market`` the same way,
+    ``candles`` builds OHLCV bars from the same fills, and ``tape`` keeps the
+    recent prints and assigns trade ids.
+
+    Prices are integer ticks of each book's ``scale`` (from ``tick_sizes``,
+    else DEFAULT_TICK_SIZE) and cash is integer cash units; decimal prices
+    and currency amounts appear only in what the engine publishes and emits.
+
+    Order ids come from ``next_order_id``, which continues after
+    ``last_order_id`` (set at startup) and every id the engine has seen.
+    Resting orders are indexed by id (to their symbol) and by user as they
+    rest and leave the books, so finding an order's book or a user's orders
+    never walks the books.
+    ``watch_order`` attaches a listener that is told synchronously about an
+    order's acceptance, fills, amendments, cancellation or expiry.
+    """
+
+    def __init__(self, symbols: Optional[List[str]] = None, persistence: Optional[PersistenceWriter] = None,
+                 journal: Optional[Journal] = None, snapshot_interval: Optional[float] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow, verbose: bool = True,
+                 ledger: Optional[AccountLedger] = None, risk: Optional[PreTradeRisk] = None,
+                 market: Optional[MarketView] = None, candles: Optional[CandleBuilder] = None,
+                 tape: Optional[TradeTape] = None, tick_sizes: Optional[Dict[str, float]] = None):
+        self.books: Dict[str, OrderBook] = {}
+        self.tick_sizes = {symbol.upper(): size for symbol, size in (tick_sizes or {}).items()}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._snapshot_lock = asyncio.Lock()
         self.is_running = False
         self.connection_manager = None
+        self._tickers: Dict[str, tuple] = {}
+        self.persistence = persistence
+        self.journal = journal
+        self.ledger = ledger if ledger is not None else AccountLedger()
+        self.risk = risk
+        self.market = market if market is not None else MarketView()
+        self.candles = candles if candles is not None else CandleBuilder()
+        self.tape = tape if tape is not None else TradeTape()
+        self.last_order_id = 0
+        self._watchers: Dict[int, ExecutionListener] = {}
+        self._user_orders: Dict[int, Set[int]] = {}
+        self._order_symbols: Dict[int, str] = {}
+        self._events: List[PersistenceEvent] = []
+        self._messages: List[tuple] = []
+        self._replaying: Optional[Journal] = None
+        self.snapshot_interval = snapshot_interval or float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+        self.clock = clock
+        self.verbose = verbose
+        
+        for symbol in symbols or DEFAULT_SYMBOLS:
+            self.list_symbol(symbol)
+    
+    def list_symbol(self, symbol: str) -> OrderBook:
+        """Register a tradable symbol, creating its order book if needed"""
+        symbol = symbol.upper()
+        if symbol not in self.books:
+            scale = TickScale(self.tick_sizes.get(symbol, DEFAULT_TICK_SIZE))
+            self.books[symbol] = OrderBook(symbol, scale)
+            self._locks[symbol] = asyncio.Lock()
+        return self.books[symbol]
+    
+    def is_listed(self, symbol: str) -> bool:
+        return symbol.upper() in self.books
+    
+    def price_scale(self, symbol: str) -> TickScale:
+        """Tick scale of a listed symbol, for converting prices at the API edge"""
+        return self.books[symbol.upper()].scale
+    
+    def get_order(self, order_id: int) -> Optional[EngineOrder]:
+        """Resting order by id, or None if it is not on any book"""
+        book = self._find_book(order_id)
+        return book.get(order_id) if book else None
+    
+    def next_order_id(self) -> int:
+        """Allocate the id for a new order"""
+        self.last_order_id += 1
+        return self.last_order_id
+    
+    def watch_order(self, order_id: int, listener: ExecutionListener):
+        """Report an order's execution events to ``listener`` until it is filled, cancelled or expires"""
+        self._watchers[order_id] = listener
+    
+    def unwatch_order(self, order_id: int):
+        self._watchers.pop(order_id, None)
+    
+    def _report(self, event: str, order: EngineOrder, trade: Optional[Print] = None):
+        listener = self._watchers.get(order.id)
+        if listener is None:
+            return
+        if event in ("cancelled", "expired") or order.status == OrderStatus.FILLED:
+            del self._watchers[order.id]
+        listener(event, order, trade)
+    
+    def _find_book(self, order_id: int) -> Optional[OrderBook]:
+        """Book currently holding a resting order, if any"""
+        symbol = self._order_symbols.get(order_id)
+        return self.books[symbol] if symbol is not None else None
         
     async def start(self, connection_manager):
         """Start the matching engine"""
         self.connection_manager = connection_manager
         self.is_running = True
-        print("🔥 Matching Engine started for CQAF")
+        print(f"🔥 Matching Engine started for {', '.join(self.books)}")
         
         # Start continuous matching loop
         asyncio.create_task(self._continuous_matching())
+        asyncio.create_task(self._candle_loop())
+        if self.journal is not None:
+            asyncio.create_task(self._snapshot_loop())
     
     async def stop(self):
         """Stop the matching engine"""
         self.is_running = False
+        # Store the bars still open so they resume after a restart
+        for bar in self.candles.open_bars.values():
+            self._emit_candle(bar)
+        await self._commit()
+        if self.journal is not None:
+            await self.take_snapshot()
+            self.journal.close()
         print("⏹️ Matching Engine stopped")
     
-    async def add_order(self, order: Order, db: Session):
-        """Add new order to the matching engine"""
-        print(f"📝 New order: {order.side.value} {order.quantity} CQAF @ {order.price or 'MARKET'}")
+    def restore_resting_orders(self, orders: Iterable[EngineOrder]) -> int:
+        """Place already-resting orders straight onto their books, in priority order, without matching"""
+        restored = 0
+        for order in orders:
+            book = self.books.get(order.symbol)
+            if book is not None:
+                self._rest(book, order)
+                restored += 1
+        if self.risk is not None:
+            self.risk.rebuild(self.books.values())
+        return restored
+    
+    async def recover(self, persisted_seq: Optional[int] = None) -> int:
+        """Rebuild the books from the latest snapshot plus the journal tail.
+
+        The tail is replayed through the normal matching path without
+        journaling. Inputs up to ``persisted_seq``, the last journal sequence
+        number whose output reached the database, are replayed with
+        persistence and the in-memory account and market state (ledger, market
+        view, candles, trade tape) detached, since that state was loaded from
+        the database. The inputs after it are replayed into the real state and
+        their output is written again. Without ``persisted_seq`` the database
+        is taken to cover the whole journal.
+        Returns the number of resting orders after recovery.
+        """
+        journal = self.journal
+        snapshot_seq, orders = journal.load_snapshot()
+        self.restore_resting_orders(orders)
+        journal.seq = snapshot_seq
+        
+        state = self.persistence, self.ledger, self.market, self.candles, self.tape
+        self.persistence, self.ledger, self.market, self.candles, self.tape = (
+            None, AccountLedger(), MarketView(), CandleBuilder(), TradeTape()
+        )
+        self.journal, self._replaying = None, journal
+        risk, self.risk = self.risk, None
+        attached = False
+        replayed = rewritten = 0
+        try:
+            for record in journal.replay(after_seq=snapshot_seq):
+                journal.seq = record.seq
+                if not attached and persisted_seq is not None and record.seq > persisted_seq:
+                    # The database stops here; from now on the output is written again
+                    attached = True
+                    self.persistence, self.ledger, self.market, self.candles, self.tape = state
+                if isinstance(record, NewOrderRecord):
+                    if not self.is_listed(record.order.symbol):
+                        # Delisted since; its resting orders were not restored either
+                        print(f"⚠️ Skipping journaled order {record.order.id} in unlisted {record.order.symbol}")
+                        continue
+                    await self.add_order(record.order, store=attached)
+                elif isinstance(record, CancelRecord):
+                    await self.cancel_order(record.order_id)
+                elif isinstance(record, AmendRecord):
+                    await self.amend_order(record.order_id, price=record.price, quantity=record.quantity)
+                else:
+                    continue
+                replayed += 1
+                if attached:
+                    rewritten += 1
+        finally:
+            self.persistence, self.ledger, self.market, self.candles, self.tape = state
+            self.journal, self._replaying, self.risk = journal, None, risk
+        
+        if self.risk is not None:
+            self.risk.rebuild(self.books.values())
+        journal.open()
+        resting = sum(len(book) for book in self.books.values())
+        print(f"♻️ Recovered {resting} resting orders (snapshot @ {snapshot_seq}, {replayed} journal inputs "
+              f"replayed, {rewritten} of them written to the database again)")
+        return resting
+    
+    def _rest(self, book: OrderBook, order: EngineOrder):
+        """Put an order on its book and into the indexes of resting orders"""
+        book.add(order)
+        self._order_symbols[order.id] = book.symbol
+        self._user_orders.setdefault(order.user_id, set()).add(order.id)
+    
+    def _unrest(self, book: OrderBook, order_id: int) -> Optional[EngineOrder]:
+        """Take an order off its book and out of the indexes; None if it is not resting"""
+        order = book.remove(order_id)
+        if order is not None:
+            del self._order_symbols[order_id]
+            user_orders = self._user_orders[order.user_id]
+            user_orders.discard(order_id)
+            if not user_orders:
+                del self._user_orders[order.user_id]
+        return order
+    
+    @contextlib.asynccontextmanager
+    async def _holding_locks(self, symbols: Iterable[str]) -> AsyncIterator[None]:
+        """Hold several books' locks at once, always taken in symbol order so callers cannot deadlock"""
+        locks = [self._locks[symbol] for symbol in sorted(set(symbols))]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in locks:
+                lock.release()
+    
+    async def take_snapshot(self):
+        """Write a compact snapshot of every resting order and trim the journal it covers.
+
+        Matching only pauses while the orders' fields are copied; encoding
+        and writing the file run on a worker thread after the locks are
+        released. The journal is only trimmed once the database has caught up
+        with the snapshot, since recovery replays it to rewrite what the
+        database is missing.
+        """
+        async with self._snapshot_lock:
+            async with self._holding_locks(self._locks):
+                symbols = list(self.books)
+                seq = self.journal.seq
+                rows = self._snapshot_rows()
+                self.journal.rotate()
+            
+            if self.persistence is not None:
+                await self.persistence.flush()
+            await asyncio.to_thread(self._write_snapshot, symbols, rows, seq)
+    
+    def _snapshot_rows(self) -> List[tuple]:
+        """Fields of every resting order in priority order, as ``Journal.encode_snapshot`` takes them"""
+        rows = []
+        append = rows.append
+        for symbol_index, book in enumerate(self.books.values()):
+            for side_index, side in enumerate((book.bids, book.asks)):
+                for level in side:
+                    price = level.price
+                    node = level.head
+                    while node is not None:
+                        order = node.order
+                        append((order.id, order.user_id, symbol_index, side_index,
+                                order.quantity, order.filled_quantity, price))
+                        node = node.next
+        return rows
+    
+    def _write_snapshot(self, symbols: List[str], rows: List[tuple], seq: int):
+        self.journal.write_snapshot(self.journal.encode_snapshot(symbols, rows, seq), seq)
+    
+    async def _snapshot_loop(self):
+        """Periodically snapshot the books so recovery only replays a short journal tail"""
+        while self.is_running:
+            await asyncio.sleep(self.snapshot_interval)
+            if self.is_running and self.journal.seq != self.journal.snapshot_seq:
+                await self.take_snapshot()
+    
+    def check_order(self, order: EngineOrder):
+        """Raise ValueError if ``order`` would be rejected, without accepting it.
+
+        Lets order entry refuse an order before storing it; ``add_order``
+        repeats the check under the book lock.
+        """
+        book = self.books.get(order.symbol)
+        if book is None:
+            raise ValueError(f"Symbol '{order.symbol}' is not listed.")
+        self._check_persisting()
+        if self.risk is not None:
+            self.risk.check(order, book)
+    
+    def _check_persisting(self):
+        """Refuse new orders while their trades could not be saved"""
+        if self.persistence is not None and not self.persistence.healthy and self._replaying is None:
+            raise ValueError("Order entry is suspended: the exchange cannot write to its database.")
+    
+    async def add_order(self, order: EngineOrder, store: bool = False):
+        """Add new order to the matching engine, routed to its symbol's book.
+
+        With ``store``, the order has no database row yet; one is written
+        behind once the order is accepted.
+        """
+        book = self.books.get(order.symbol)
+        if book is None:
+            raise ValueError(f"Symbol '{order.symbol}' is not listed.")
         
-        # Handle market orders immediately
+        async with self._locks[book.symbol]:
+            await self._wait_for_room()
+            try:
+                self._accept(book, order, store)
+                self._publish_market_data(book)
+            finally:
+                await self._commit()
+    
+    async def add_orders(self, orders: List[EngineOrder], store: bool = False) -> List[Optional[str]]:
+        """Add a batch of orders in one pass.
+
+        The books involved are locked once for the whole batch and each
+        publishes a single market data update at the end, however many of the
+        orders touched it. Orders are processed in the given sequence, so later
+        ones are checked against the reservations of earlier ones. With
+        ``store``, rows for the accepted orders are written behind, as in
+        ``add_order``. Returns, per order, None if it was accepted or the reason
+        it was rejected.
+        """
+        results: List[Optional[str]] = [None] * len(orders)
+        books = {}
+        for i, order in enumerate(orders):
+            book = self.books.get(order.symbol)
+            if book is None:
+                results[i] = f"Symbol '{order.symbol}' is not listed."
+            else:
+                books[book.symbol] = book
+        
+        async with self._holding_locks(books):
+            await self._wait_for_room()
+            try:
+                for i, order in enumerate(orders):
+                    if results[i] is not None:
+                        continue
+                    try:
+                        self._accept(books[order.symbol], order, store)
+                    except ValueError as e:
+                        results[i] = str(e)
+                for book in books.values():
+                    self._publish_market_data(book)
+            finally:
+                await self._commit()
+        return results
+    
+    def _accept(self, book: OrderBook, order: EngineOrder, store: bool = False):
+        """Risk-check, journal and match a new order; called inside an input"""
+        if self.verbose:
+            price = _to_price(book.scale, order.price)
+            print(f"📝 New order: {order.side.value} {order.quantity} {order.symbol} @ {price or 'MARKET'}")
+        
+        self._check_persisting()
+        if self.risk is not None:
+            self.risk.check(order, book)
+        if order.id > self.last_order_id:
+            self.last_order_id = order.id
+        if self.journal is not None:
+            self.journal.append_new_order(order)
+        if self.risk is not None:
+            self.risk.reserve(order, book.scale)
+        if store:
+            order.created_at = self.clock()
+            self._emit(NewOrder(
+                order_id=order.id,
+                user_id=order.user_id,
+                symbol=order.symbol,
+                side=order.side,
+                order_type=order.order_type,
+                quantity=order.quantity,
+                price=_to_price(book.scale, order.price),
+                timestamp=order.created_at
+            ))
+        self._report("accepted", order)
         if order.order_type == OrderType.MARKET:
-            await self._execute_market_order(order, db)
+            self._execute_market_order(book, order)
         else:
-            # Add limit order to appropriate book
-            if order.side == OrderSide.BUY:
-                self.buy_orders.append(order)
-                self.buy_orders.sort(key=lambda x: (-x.price, x.created_at))  # Highest price first
-            else:
-                self.sell_orders.append(order)
-                self.sell_orders.sort(key=lambda x: (x.price, x.created_at))  # Lowest price first
-            
-            # Try to match immediately
-            await self._match_orders(db)
+            self._match_orders(book, order)
+    
+    async def cancel_order(self, order_id: int) -> Optional[EngineOrder]:
+        """Remove a resting order from the book.
+
+        Returns the cancelled order, or None if the order is not resting
+        (already filled, cancelled, or never added to the engine).
+        """
+        book = self._find_book(order_id)
+        if book is None:
+            return None
+        
+        async with self._locks[book.symbol]:
+            await self._wait_for_room()
+            try:
+                order = self._cancel(book, order_id)
+                if order is not None:
+                    self._publish_market_data(book)
+            finally:
+                await self._commit()
+        return order
+    
+    async def cancel_orders(self, order_ids: List[int]) -> List[Optional[EngineOrder]]:
+        """Cancel a batch of resting orders, locking each book involved once.
+
+        Returns the cancelled order or None for each id, like ``cancel_order``.
+        """
+        found = [(order_id, self._find_book(order_id)) for order_id in order_ids]
+        books = {book.symbol: book for _, book in found if book is not None}
+        cancelled: List[Optional[EngineOrder]] = []
+        
+        async with self._holding_locks(books):
+            await self._wait_for_room()
+            try:
+                for order_id, book in found:
+                    cancelled.append(self._cancel(book, order_id) if book is not None else None)
+                for book in books.values():
+                    self._publish_market_data(book)
+            finally:
+                await self._commit()
+        return cancelled
+    
+    async def cancel_all(self, user_id: int, symbol: Optional[str] = None) -> List[EngineOrder]:
+        """Cancel every resting order of a user, optionally only in one symbol"""
+        order_ids = sorted(self._user_orders.get(user_id, ()))
+        if symbol:
+            symbol = symbol.upper()
+            order_ids = [order_id for order_id in order_ids if self._order_symbols[order_id] == symbol]
+        return [order for order in await self.cancel_orders(order_ids) if order is not None]
+    
+    def _cancel(self, book: OrderBook, order_id: int) -> Optional[EngineOrder]:
+        """Take a resting order off its book; called inside an input"""
+        order = self._unrest(book, order_id)
+        if order is None:
+            return None
+        if self.journal is not None:
+            self.journal.append_cancel(order_id)
+        if self.risk is not None:
+            self.risk.release(order_id)
+        order.status = OrderStatus.CANCELLED
+        self._emit_order_update(order)
+        self._report("cancelled", order)
+        
+        if self.verbose:
+            print(f"🚫 Order {order_id} cancelled")
+        return order
+    
+    async def amend_order(self, order_id: int,
+                          price: Optional[int] = None, quantity: Optional[int] = None) -> Optional[EngineOrder]:
+        """Cancel-replace a resting order in place.
+
+        Reducing quantity at the same price keeps time priority. A price change
+        or a quantity increase moves the order to the back of its new level and
+        may trade immediately if the new price crosses. ``price`` is in ticks;
+        ``quantity`` is the new total order size and must exceed what has
+        already been filled.
+        Returns None if the order is not resting.
+        """
+        book = self._find_book(order_id)
+        if book is None:
+            return None
+        
+        async with self._locks[book.symbol]:
+            await self._wait_for_room()
+            try:
+                order = book.get(order_id)
+                if order is None:
+                    return None
+                if quantity is not None and quantity <= order.filled_quantity:
+                    raise ValueError("Amended quantity must be greater than the filled quantity.")
+                if quantity is not None and quantity > MAX_QUANTITY:
+                    raise ValueError(f"Quantity may be at most {MAX_QUANTITY}.")
+                if self.risk is not None:
+                    self.risk.check(order, book, quantity=quantity, price=price)
+                if self.journal is not None:
+                    self.journal.append_amend(order_id, price, quantity)
+                
+                price_changed = price is not None and price != order.price
+                if not price_changed and (quantity is None or quantity <= order.quantity):
+                    if quantity is not None:
+                        book.reduce(order_id, order.quantity - quantity)
+                        order.quantity = quantity
+                        self._rereserve(order, book)
+                        self._emit_order_update(order)
+                        self._publish_market_data(book)
+                    self._report("amended", order)
+                    return order
+                
+                self._unrest(book, order_id)
+                if price is not None:
+                    order.price = price
+                if quantity is not None:
+                    order.quantity = quantity
+                self._rereserve(order, book)
+                self._report("amended", order)
+                self._match_orders(book, order)
+                self._emit_order_update(order)
+                self._publish_market_data(book)
+            finally:
+                await self._commit()
+        
+        if self.verbose:
+            print(f"✏️ Order {order_id} amended: {order.quantity} @ {_to_price(book.scale, order.price)}")
+        return order
+    
+    def _rereserve(self, order: EngineOrder, book: OrderBook):
+        """Replace an amended order's reservation with one for its new price and size"""
+        if self.risk is not None:
+            self.risk.release(order.id)
+            self.risk.reserve(order, book.scale)
     
     async def _continuous_matching(self):
         """Continuously check for matching opportunities"""
@@ -52,115 +559,82 @@ class MatchingEngine:
             await asyncio.sleep(0.1)  # Check every 100ms
             # Continuous matching is handled when orders are added
     
-    async def _execute_market_order(self, market_order: Order, db: Session):
+    def _execute_market_order(self, book: OrderBook, market_order: EngineOrder):
         """Execute a market order against the best available prices"""
-        remaining_quantity = market_order.quantity
-        total_cost = 0.0
-        
-        if market_order.side == OrderSide.BUY:
-            # Buy market order - match against sell orders (asks)
-            available_sells = [order for order in self.sell_orders 
-                             if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]]
-            available_sells.sort(key=lambda x: (x.price, x.created_at))
-            
-            for sell_order in available_sells:
-                if remaining_quantity <= 0:
-                    break
-                
-                trade_quantity = min(remaining_quantity, sell_order.remaining_quantity)
-                trade_price = sell_order.price
-                
-                await self._execute_trade(market_order, sell_order, trade_quantity, trade_price, db)
-                
-                remaining_quantity -= trade_quantity
-                total_cost += trade_quantity * trade_price
+        self._sweep(book, market_order)
         
-        else:
-            # Sell market order - match against buy orders (bids)
-            available_buys = [order for order in self.buy_orders 
-                            if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]]
-            available_buys.sort(key=lambda x: (-x.price, x.created_at))
-            
-            for buy_order in available_buys:
-                if remaining_quantity <= 0:
-                    break
-                
-                trade_quantity = min(remaining_quantity, buy_order.remaining_quantity)
-                trade_price = buy_order.price
-                
-                await self._execute_trade(buy_order, market_order, trade_quantity, trade_price, db)
-                
-                remaining_quantity -= trade_quantity
-                total_cost += trade_quantity * trade_price
-        
-        # Update market order status
+        # Update market order status; with nothing left to trade against, the
+        # rest of the order lapses and the order is done either way
+        remaining_quantity = market_order.remaining_quantity
         if remaining_quantity == 0:
             market_order.status = OrderStatus.FILLED
-        elif remaining_quantity < market_order.quantity:
-            market_order.status = OrderStatus.PARTIAL
+        else:
+            market_order.status = OrderStatus.CANCELLED
+        self._emit_order_update(market_order)
+        if remaining_quantity > 0:
+            self._report("expired", market_order)
+        
+        if self.verbose:
+            print(f"✅ Market order executed: {market_order.filled_quantity}/{market_order.quantity} filled")
+    
+    def _match_orders(self, book: OrderBook, order: EngineOrder):
+        """Match an incoming limit order, then rest any remainder on the book"""
+        trades_executed = self._sweep(book, order)
         
-        market_order.filled_quantity = market_order.quantity - remaining_quantity
-        db.commit()
+        if order.remaining_quantity > 0:
+            self._rest(book, order)
         
-        print(f"✅ Market order executed: {market_order.filled_quantity}/{market_order.quantity} filled")
+        if trades_executed > 0 and self.verbose:
+            print(f"🔄 Executed {trades_executed} trades")
     
-    async def _match_orders(self, db: Session):
-        """Match buy and sell orders"""
+    def _sweep(self, book: OrderBook, order: EngineOrder) -> int:
+        """Fill an incoming order against the opposite side, best price first.
+
+        Limit orders stop at the first level that no longer crosses; market
+        orders walk the book until filled or the side is empty. Trades execute
+        at the resting order's price.
+        """
+        contra = book.contra_side(order.side)
+        is_buy = order.side == OrderSide.BUY
+        is_limit = order.order_type == OrderType.LIMIT
         trades_executed = 0
         
-        while self.buy_orders and self.sell_orders:
-            # Get best buy and sell orders
-            best_buy = None
-            best_sell = None
-            
-            # Find best active buy order
-            for order in self.buy_orders:
-                if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]:
-                    best_buy = order
-                    break
+        while order.remaining_quantity > 0 and contra.best is not None:
+            level = contra.best
+            if is_limit and (order.price < level.price if is_buy else order.price > level.price):
+                break
             
-            # Find best active sell order
-            for order in self.sell_orders:
-                if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]:
-                    best_sell = order
-                    break
+            resting = level.head.order
+            trade_quantity = min(order.remaining_quantity, resting.remaining_quantity)
             
-            if not best_buy or not best_sell:
-                break
+            # Update the book before executing so market data sees the new top of book
+            if trade_quantity == resting.remaining_quantity:
+                self._unrest(book, resting.id)
+            else:
+                book.reduce(resting.id, trade_quantity)
             
-            # Check if orders can be matched
-            if best_buy.price >= best_sell.price:
-                # Determine trade price (use the order that was placed first)
-                if best_buy.created_at < best_sell.created_at:
-                    trade_price = best_buy.price
-                else:
-                    trade_price = best_sell.price
-                
-                # Determine trade quantity
-                trade_quantity = min(best_buy.remaining_quantity, best_sell.remaining_quantity)
-                
-                # Execute the trade
-                await self._execute_trade(best_buy, best_sell, trade_quantity, trade_price, db)
-                trades_executed += 1
-                
-                # Remove filled orders from books
-                if best_buy.is_fully_filled:
-                    self.buy_orders.remove(best_buy)
-                if best_sell.is_fully_filled:
-                    self.sell_orders.remove(best_sell)
+            if is_buy:
+                self._execute_trade(book, order, resting, trade_quantity, level.price, order.side)
             else:
-                # No more matches possible
-                break
+                self._execute_trade(book, resting, order, trade_quantity, level.price, order.side)
+            trades_executed += 1
         
-        if trades_executed > 0:
-            print(f"🔄 Executed {trades_executed} trades")
+        return trades_executed
     
-    async def _execute_trade(self, buy_order: Order, sell_order: Order, 
-                           quantity: int, price: float, db: Session):
-        """Execute a trade between two orders"""
+    def _execute_trade(self, book: OrderBook, buy_order: EngineOrder, sell_order: EngineOrder,
+                       quantity: int, ticks: int, aggressor: OrderSide):
+        """Execute a trade between two orders at ``ticks``; ``aggressor`` is the side of the incoming one"""
+        symbol = book.symbol
+        scale = book.scale
+        price = scale.to_price(ticks)
         trade_value = quantity * price
+        timestamp = self.clock()
         
-        print(f"💰 Trade executed: {quantity} CQAF @ ${price} (${trade_value})")
+        if self.verbose:
+            print(f"💰 Trade executed: {quantity} {symbol} @ ${price} (${trade_value})")
+        
+        if self.journal is not None:
+            self.journal.append_fill(buy_order.id, sell_order.id, quantity, ticks)
         
         # Update order fill quantities
         buy_order.filled_quantity += quantity
@@ -177,133 +651,204 @@ class MatchingEngine:
         else:
             sell_order.status = OrderStatus.PARTIAL
         
-        # Create trade records for both users
-        buy_trade = Trade(
-            buy_order_id=buy_order.id,
-            sell_order_id=sell_order.id,
-            user_id=buy_order.user_id,
-            symbol="CQAF",
-            quantity=quantity,
-            price=price,
-            trade_value=trade_value
-        )
+        # Balances and positions move in memory now; the database copy, trade
+        # records and market data are written behind
+        cash_price = scale.to_cash(ticks)
+        buyer = self.ledger.apply_fill(buy_order.user_id, symbol, quantity, cash_price)
+        seller = self.ledger.apply_fill(sell_order.user_id, symbol, -quantity, cash_price)
+        self.market.record_fill(symbol, quantity, price, timestamp)
+        closed_bars = self.candles.record_fill(symbol, quantity, price, timestamp)
+        trade = self.tape.record(symbol, price, quantity, aggressor, timestamp)
+        if self.risk is not None:
+            self.risk.release(buy_order.id, quantity)
+            self.risk.release(sell_order.id, quantity)
+        self._report("fill", buy_order, trade)
+        self._report("fill", sell_order, trade)
         
-        sell_trade = Trade(
+        self._emit(Fill(
+            symbol=symbol,
             buy_order_id=buy_order.id,
             sell_order_id=sell_order.id,
-            user_id=sell_order.user_id,
-            symbol="CQAF",
+            buy_user_id=buy_order.user_id,
+            sell_user_id=sell_order.user_id,
             quantity=quantity,
             price=price,
-            trade_value=trade_value
-        )
-        
-        db.add(buy_trade)
-        db.add(sell_trade)
+            best_bid=_to_price(scale, book.best_bid),
+            best_ask=_to_price(scale, book.best_ask),
+            timestamp=timestamp,
+            trade_id=trade.id,
+            aggressor=aggressor
+        ))
+        self._emit_order_update(buy_order)
+        self._emit_order_update(sell_order)
+        self._emit_account_update(buyer, symbol)
+        self._emit_account_update(seller, symbol)
         
-        # Update user balances and positions
-        await self._update_user_balance_and_position(buy_order.user_id, quantity, price, OrderSide.BUY, db)
-        await self._update_user_balance_and_position(sell_order.user_id, quantity, price, OrderSide.SELL, db)
-        
-        # Update market data
-        await self._update_market_data(price, quantity, db)
-        
-        db.commit()
+        for bar in closed_bars:
+            self._emit_candle(bar)
         
         # Broadcast trade to connected clients
-        await self._broadcast_trade({
+        self._broadcast_trade({
             "type": "trade",
-            "symbol": "CQAF",
+            "id": trade.id,
+            "symbol": symbol,
+            "side": aggressor.value,
             "price": price,
             "quantity": quantity,
             "value": trade_value,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp.isoformat()
         })
+        self._publish_candles(closed_bars, symbol)
     
-    async def _update_user_balance_and_position(self, user_id: int, quantity: int, 
-                                              price: float, side: OrderSide, db: Session):
-        """Update user's balance and position after a trade"""
-        user = db.query(User).filter(User.id == user_id).first()
-        position = db.query(Position).filter(
-            Position.user_id == user_id,
-            Position.symbol == "CQAF"
-        ).first()
-        
-        if not position:
-            position = Position(
-                user_id=user_id,
-                symbol="CQAF",
-                quantity=0,
-                average_price=0.0
-            )
-            db.add(position)
-        
-        trade_value = quantity * price
-        
-        if side == OrderSide.BUY:
-            # Buyer: decrease balance, increase position
-            user.balance -= trade_value
-            
-            # Update position with weighted average price
-            if position.quantity > 0:
-                total_cost = (position.quantity * position.average_price) + trade_value
-                total_quantity = position.quantity + quantity
-                position.average_price = total_cost / total_quantity
-            else:
-                position.average_price = price
-            
-            position.quantity += quantity
-            
-        else:
-            # Seller: increase balance, decrease position
-            user.balance += trade_value
-            position.quantity -= quantity
-            
-            # Calculate realized P&L
-            if position.average_price > 0:
-                realized_pnl = (price - position.average_price) * quantity
-                position.realized_pnl += realized_pnl
-        
-        # Update unrealized P&L (will be calculated with current market price)
-        # This would be done in a separate process with live market data
+    def _emit(self, event: PersistenceEvent):
+        """Collect an event for the persistence pipeline, if one is attached, until the next commit"""
+        if self.persistence is not None:
+            self._events.append(event)
     
-    async def _update_market_data(self, price: float, volume: int, db: Session):
-        """Update market data with new trade information"""
-        market_data = db.query(MarketData).filter(MarketData.symbol == "CQAF").first()
-        
-        if market_data:
-            market_data.last_price = price
-            market_data.volume += volume
-            market_data.high_price = max(market_data.high_price, price)
-            market_data.low_price = min(market_data.low_price, price)
-            market_data.timestamp = datetime.utcnow()
-            
-            # Update bid/ask based on current order book
-            best_bid = max([order.price for order in self.buy_orders 
-                           if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]], default=None)
-            best_ask = min([order.price for order in self.sell_orders 
-                           if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]], default=None)
-            
-            market_data.bid_price = best_bid
-            market_data.ask_price = best_ask
-        
-        db.commit()
+    async def _wait_for_room(self):
+        """Hold up an input, before it touches the books, while the persistence queue is full"""
+        if self.persistence is not None:
+            await self.persistence.wait_for_room()
     
-    async def _broadcast_trade(self, trade_data: dict):
-        """Broadcast trade information to connected WebSocket clients"""
+    async def _commit(self):
+        """Queue the collected events as one unit, then send the collected market data messages.
+
+        Each input calls this on its way out while still holding its books'
+        locks. Nothing between the input's first journal record and here may
+        await, or another book's input could slip in between and the
+        database would no longer stop at an input boundary of the journal.
+        """
+        events, self._events = self._events, []
+        if events:
+            journal = self.journal or self._replaying
+            self.persistence.commit(journal.seq if journal is not None else 0, events)
+        messages, self._messages = self._messages, []
+        for channel, message in messages:
+            await self.connection_manager.publish(channel, message)
+    
+    def _send(self, channel: str, message: dict):
+        """Collect a message for WebSocket subscribers until the next commit"""
+        self._messages.append((channel, message))
+    
+    def _emit_order_update(self, order: EngineOrder):
+        if self.persistence is None:
+            return
+        self._emit(OrderUpdate(
+            order_id=order.id,
+            status=order.status,
+            filled_quantity=order.filled_quantity,
+            quantity=order.quantity,
+            price=_to_price(self.books[order.symbol].scale, order.price)
+        ))
+    
+    def _emit_account_update(self, account, symbol: str):
+        position = account.positions[symbol]
+        self._emit(AccountUpdate(user_id=account.user_id, balance=from_cash(account.balance)))
+        self._emit(PositionUpdate(
+            user_id=account.user_id,
+            symbol=symbol,
+            quantity=position.quantity,
+            average_price=from_cash(position.average_cost),
+            realized_pnl=from_cash(position.realized_pnl)
+        ))
+    
+    def _emit_candle(self, bar: Bar):
+        self._emit(CandleUpdate(
+            symbol=bar.symbol,
+            interval=bar.interval,
+            start=from_seconds(bar.start),
+            open=bar.open,
+            high=bar.high,
+            low=bar.low,
+            close=bar.close,
+            volume=bar.volume,
+            vwap=bar.vwap,
+            trades=bar.trades
+        ))
+    
+    async def _candle_loop(self):
+        """Close bars on time, so a symbol that stops trading still completes its bars"""
+        while self.is_running:
+            await asyncio.sleep(1)
+            closed = self.candles.close_due(self.clock())
+            for bar in closed:
+                self._emit_candle(bar)
+            self._publish_candles(closed)
+            await self._commit()
+    
+    def _publish_candles(self, closed: List[Bar], symbol: Optional[str] = None):
+        """Push closed bars, then the open bars of ``symbol`` after a fill, to candle subscribers"""
+        manager = self.connection_manager
+        if manager is None:
+            return
+        for bar in closed:
+            channel = f"candles:{bar.symbol}:{bar.interval}"
+            if manager.has_subscribers(channel):
+                self._send(channel, {"type": "candle", "closed": True, **bar.to_dict()})
+        if symbol is None:
+            return
+        for interval in CANDLE_INTERVALS:
+            channel = f"candles:{symbol}:{interval}"
+            if manager.has_subscribers(channel):
+                bar = self.candles.current(symbol, interval)
+                self._send(channel, {"type": "candle", "closed": False, **bar.to_dict()})
+    
+    def _broadcast_trade(self, trade_data: dict):
+        """Publish trade information to the symbol's trades channel"""
         if self.connection_manager:
-            await self.connection_manager.broadcast(trade_data)
-    
-    def get_order_book_snapshot(self) -> Dict:
-        """Get current order book snapshot"""
-        active_buys = [order for order in self.buy_orders 
-                      if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]]
-        active_sells = [order for order in self.sell_orders 
-                       if order.status in [OrderStatus.PENDING, OrderStatus.PARTIAL]]
-        
+            self._send(f"trades:{trade_data['symbol']}", trade_data)
+    
+    def _publish_market_data(self, book: OrderBook):
+        """Push the level-2 delta, and the ticker if it changed, to WebSocket subscribers after a book change"""
+        # Sequence the delta even when nobody is listening, so seq tracks every change
+        changes = book.take_changes()
+        manager = self.connection_manager
+        if manager is None:
+            return
+        symbol = book.symbol
+        if changes is not None and manager.has_subscribers(f"book:{symbol}"):
+            seq, bids, asks = changes
+            self._send(f"book:{symbol}", {
+                "type": "book_delta",
+                "symbol": symbol,
+                "seq": seq,
+                "bids": _to_prices(book.scale, bids),
+                "asks": _to_prices(book.scale, asks),
+                "timestamp": self.clock().isoformat()
+            })
+        ticker = (book.best_bid, book.best_ask, self.ledger.last_prices.get(symbol))
+        if ticker != self._tickers.get(symbol):
+            self._tickers[symbol] = ticker
+            if manager.has_subscribers(f"ticker:{symbol}"):
+                self._send(f"ticker:{symbol}", self.get_ticker_message(symbol))
+    
+    def get_book_snapshot_message(self, symbol: str) -> Dict:
+        """The full level-2 book, tagged with the ``seq`` of the last delta it reflects"""
+        return {"type": "book_snapshot", **self.get_order_book_snapshot(symbol, depth=None)}
+    
+    def get_ticker_message(self, symbol: str) -> Dict:
+        """Top of book and last price for the ``ticker:<symbol>`` channel"""
+        book = self.books[symbol.upper()]
+        last_price = self.ledger.last_prices.get(book.symbol)
+        return {
+            "type": "ticker",
+            "symbol": book.symbol,
+            "best_bid": _to_price(book.scale, book.best_bid),
+            "best_ask": _to_price(book.scale, book.best_ask),
+            "last_price": from_cash(last_price) if last_price is not None else None,
+            "timestamp": self.clock().isoformat()
+        }
+    
+    def get_order_book_snapshot(self, symbol: str = "CQAF", depth: Optional[int] = 10) -> Dict:
+        """Current (price, quantity, order count) levels per side, ``depth`` levels deep (None for all).
+
+        ``seq`` is the book's delta sequence number, which versions the snapshot.
+        """
+        book = self.books[symbol.upper()]
         return {
-            "symbol": "CQAF",
-            "bids": [(order.price, order.remaining_quantity) for order in active_buys[:10]],
-            "asks": [(order.price, order.remaining_quantity) for order in active_sells[:10]],
-            "timestamp": datetime.utcnow().isoformat()
-        }
\ No newline at end of file
+            "symbol": book.symbol,
+            "seq": book.seq,
+            "bids": _to_prices(book.scale, book.bids.depth(len(book.bids) if depth is None else depth)),
+            "asks": _to_prices(book.scale, book.asks.depth(len(book.asks) if depth is None else depth)),
+            "timestamp": self.clock().isoformat()
+        }
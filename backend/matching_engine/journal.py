@@ -0,0 +1,281 @@
+import os
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from backend.models.models import OrderSide, OrderType, OrderStatus
+from backend.matching_engine.orders import EngineOrder
+
+# Every journal record is a fixed header followed by a type-specific payload
+# Prices are integer ticks; NO_PRICE marks a market order or an unchanged price
+_HEADER = struct.Struct("<QBI")          # sequence, record type, payload length
+_NEW_ORDER = struct.Struct("<qqBBqqH")   # order id, user id, side, type, quantity, price, symbol length
+_CANCEL = struct.Struct("<q")            # order id
+_AMEND = struct.Struct("<qqq")           # order id, new price, new quantity (0 = unchanged)
+_FILL = struct.Struct("<qqqq")           # buy order id, sell order id, quantity, price
+NO_PRICE = -2 ** 63
+
+NEW_ORDER = 1
+CANCEL = 2
+AMEND = 3
+FILL = 4
+
+_SNAPSHOT_MAGIC = b"QXSNAP1\0"
+_SNAPSHOT_HEADER = struct.Struct("<QH")  # sequence, symbol count
+_SNAPSHOT_COUNT = struct.Struct("<Q")
+_SNAPSHOT_ORDER = struct.Struct("<qqHBqqq")  # order id, user id, symbol index, side, quantity, filled, price
+
+_SIDES = [OrderSide.BUY, OrderSide.SELL]
+_TYPES = [OrderType.LIMIT, OrderType.MARKET]
+
+class NewOrderRecord(NamedTuple):
+    seq: int
+    order: EngineOrder
+
+class CancelRecord(NamedTuple):
+    seq: int
+    order_id: int
+
+class AmendRecord(NamedTuple):
+    seq: int
+    order_id: int
+    price: Optional[int]  # ticks
+    quantity: Optional[int]
+
+class FillRecord(NamedTuple):
+    seq: int
+    buy_order_id: int
+    sell_order_id: int
+    quantity: int
+    price: int  # ticks
+
+JournalRecord = Union[NewOrderRecord, CancelRecord, AmendRecord, FillRecord]
+
+def read_segment(path: str) -> Iterator[Tuple[int, int, bytes, int]]:
+    """Raw (sequence, type, buffer, payload offset) for every record in one journal file.
+
+    A record cut short by a crash ends the file cleanly.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        seq, record_type, length = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        if offset + length > len(data):
+            break
+        yield seq, record_type, data, offset
+        offset += length
+
+def decode_record(seq: int, record_type: int, data: bytes, offset: int) -> "JournalRecord":
+    """Decode one raw journal record"""
+    if record_type == NEW_ORDER:
+        order_id, user_id, side, order_type, quantity, price, symbol_length = _NEW_ORDER.unpack_from(data, offset)
+        start = offset + _NEW_ORDER.size
+        order = EngineOrder(
+            id=order_id,
+            user_id=user_id,
+            symbol=data[start:start + symbol_length].decode(),
+            side=_SIDES[side],
+            order_type=_TYPES[order_type],
+            quantity=quantity,
+            price=None if price == NO_PRICE else price,
+            filled_quantity=0,
+            status=OrderStatus.PENDING
+        )
+        return NewOrderRecord(seq, order)
+    if record_type == CANCEL:
+        return CancelRecord(seq, *_CANCEL.unpack_from(data, offset))
+    if record_type == AMEND:
+        order_id, price, quantity = _AMEND.unpack_from(data, offset)
+        return AmendRecord(seq, order_id, None if price == NO_PRICE else price, quantity or None)
+    if record_type == FILL:
+        return FillRecord(seq, *_FILL.unpack_from(data, offset))
+    raise ValueError(f"Unknown journal record type {record_type} at sequence {seq}")
+
+def read_journal_file(path: str) -> Iterator["JournalRecord"]:
+    """Decoded records of one journal file, e.g. for offline replay"""
+    for seq, record_type, data, offset in read_segment(path):
+        yield decode_record(seq, record_type, data, offset)
+
+class Journal:
+    """Sequenced, append-only binary journal of matching engine inputs and outputs.
+
+    Inputs (new order, cancel, amend) are written inside the symbol's lock
+    before they are applied, so replaying them in sequence order rebuilds the
+    exact same books. Fills are journaled as outputs for audit and downstream
+    consumers; replay regenerates them rather than reading them back.
+
+    The journal is split into segment files named after their first sequence
+    number. Taking a snapshot starts a new segment, and older segments are
+    deleted once the snapshot is safely on disk, so recovery only ever reads
+    the latest snapshot plus a short journal tail.
+    """
+
+    SNAPSHOT_FILE = "book.snapshot"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("JOURNAL_DIR", "./journal")
+        self.seq = 0
+        self.snapshot_seq = 0
+        self._file: Optional[BinaryIO] = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    # Segment management
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".journal"):
+                segments.append((int(name.split(".")[0]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, self.SNAPSHOT_FILE)
+
+    def is_empty(self) -> bool:
+        """True if there is neither a snapshot nor any journaled record"""
+        if os.path.exists(self._snapshot_path()):
+            return False
+        return all(os.path.getsize(path) == 0 for _, path in self._segments())
+
+    def open(self):
+        """Open a fresh segment for appending, continuing the existing sequence"""
+        if not self.seq:
+            self.seq = max(self.snapshot_seq, self._last_seq())
+        self._start_segment()
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _start_segment(self):
+        self.close()
+        # No complete record can exist yet in the segment starting at seq + 1,
+        # so anything there is a torn write from a crash
+        path = os.path.join(self.directory, f"{self.seq + 1:020d}.journal")
+        self._file = open(path, "wb")
+
+    def _last_seq(self) -> int:
+        last = self.snapshot_seq
+        for seq, _, _, _ in self._records():
+            last = max(last, seq)
+        return last
+
+    # Appending
+
+    def _append(self, record_type: int, payload: bytes) -> int:
+        self.seq += 1
+        self._file.write(_HEADER.pack(self.seq, record_type, len(payload)) + payload)
+        self._file.flush()
+        return self.seq
+
+    def append_new_order(self, order: EngineOrder) -> int:
+        symbol = order.symbol.encode()
+        price = order.price if order.price is not None else NO_PRICE
+        payload = _NEW_ORDER.pack(order.id, order.user_id, _SIDES.index(order.side),
+                                  _TYPES.index(order.order_type), order.quantity, price, len(symbol)) + symbol
+        return self._append(NEW_ORDER, payload)
+
+    def append_cancel(self, order_id: int) -> int:
+        return self._append(CANCEL, _CANCEL.pack(order_id))
+
+    def append_amend(self, order_id: int, price: Optional[int], quantity: Optional[int]) -> int:
+        return self._append(AMEND, _AMEND.pack(order_id,
+                                               price if price is not None else NO_PRICE,
+                                               quantity or 0))
+
+    def append_fill(self, buy_order_id: int, sell_order_id: int, quantity: int, price: int) -> int:
+        return self._append(FILL, _FILL.pack(buy_order_id, sell_order_id, quantity, price))
+
+    # Reading
+
+    def _records(self) -> Iterator[Tuple[int, int, bytes, int]]:
+        for _, path in self._segments():
+            yield from read_segment(path)
+
+    def replay(self, after_seq: int) -> Iterator[JournalRecord]:
+        """Yield every journaled record with a sequence number above ``after_seq``"""
+        for seq, record_type, data, offset in self._records():
+            if seq > after_seq:
+                yield decode_record(seq, record_type, data, offset)
+
+    # Snapshots
+
+    @staticmethod
+    def encode_snapshot(symbols: List[str], rows: List[tuple], seq: int) -> bytes:
+        """Serialize resting orders, in book priority order, tagged with the sequence they were taken at.
+
+        Each row is (order id, user id, index into ``symbols``, side (0 buy,
+        1 sell), quantity, filled quantity, price in ticks).
+        """
+        parts = [_SNAPSHOT_MAGIC, _SNAPSHOT_HEADER.pack(seq, len(symbols))]
+        for symbol in symbols:
+            encoded = symbol.encode()
+            parts.append(struct.pack("<H", len(encoded)) + encoded)
+        parts.append(_SNAPSHOT_COUNT.pack(len(rows)))
+        pack = _SNAPSHOT_ORDER.pack
+        parts.extend(pack(*row) for row in rows)
+        return b"".join(parts)
+
+    def rotate(self):
+        """Start a new segment at the current sequence (called with the books locked)"""
+        self._start_segment()
+
+    def write_snapshot(self, snapshot: bytes, seq: int):
+        """Atomically replace the snapshot file, then drop segments it covers"""
+        path = self._snapshot_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.snapshot_seq = seq
+
+        # The segment rotated in at snapshot time starts at seq + 1; everything
+        # before it is covered by the snapshot
+        for start, segment_path in self._segments():
+            if start <= seq:
+                os.remove(segment_path)
+
+    def load_snapshot(self) -> Tuple[int, List[EngineOrder]]:
+        """Sequence number and resting orders of the latest snapshot (0, [] if none)"""
+        path = self._snapshot_path()
+        if not os.path.exists(path):
+            return 0, []
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            raise ValueError(f"{path} is not a book snapshot")
+
+        offset = len(_SNAPSHOT_MAGIC)
+        seq, symbol_count = _SNAPSHOT_HEADER.unpack_from(data, offset)
+        offset += _SNAPSHOT_HEADER.size
+        symbols = []
+        for _ in range(symbol_count):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            symbols.append(data[offset:offset + length].decode())
+            offset += length
+        (count,) = _SNAPSHOT_COUNT.unpack_from(data, offset)
+        offset += _SNAPSHOT_COUNT.size
+
+        orders = []
+        end = offset + count * _SNAPSHOT_ORDER.size
+        for order_id, user_id, symbol, side, quantity, filled, price in _SNAPSHOT_ORDER.iter_unpack(data[offset:end]):
+            orders.append(EngineOrder(
+                id=order_id,
+                user_id=user_id,
+                symbol=symbols[symbol],
+                side=_SIDES[side],
+                order_type=OrderType.LIMIT,
+                quantity=quantity,
+                price=price,
+                filled_quantity=filled,
+                status=OrderStatus.PARTIAL if filled else OrderStatus.PENDING
+            ))
+        self.snapshot_seq = seq
+        return seq, orders
@@ -0,0 +1,130 @@
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.models.models import User, Position, MarketData
+from backend.matching_engine.ticks import to_cash
+
+class PositionState:
+    """A user's holding in one symbol.
+
+    ``cost`` is what the open quantity cost, and ``realized_pnl`` what closed
+    quantity made, both in integer cash units, so fills never accumulate
+    floating point error.
+    """
+    __slots__ = ("symbol", "quantity", "cost", "realized_pnl")
+
+    def __init__(self, symbol: str, quantity: int = 0, cost: int = 0, realized_pnl: int = 0):
+        self.symbol = symbol
+        self.quantity = quantity
+        self.cost = cost
+        self.realized_pnl = realized_pnl
+
+    @property
+    def average_cost(self) -> float:
+        """Average entry price in cash units per contract"""
+        return self.cost / abs(self.quantity) if self.quantity else 0.0
+
+    def apply(self, quantity: int, price: int):
+        """Apply a signed fill (positive = bought) at ``price`` cash units per contract.
+
+        Adding to a position (or opening one) adds to its cost; reducing it
+        realizes P&L against the cost of the closed part; a fill that flips
+        the position through zero opens the remainder at the fill price.
+        """
+        if self.quantity == 0 or (self.quantity > 0) == (quantity > 0):
+            self.quantity += quantity
+            self.cost += abs(quantity) * price
+            return
+
+        held = abs(self.quantity)
+        closed = min(abs(quantity), held)
+        direction = 1 if self.quantity > 0 else -1
+        closed_cost = self.cost if closed == held else self.cost * closed // held
+        self.realized_pnl += (closed * price - closed_cost) * direction
+        self.cost -= closed_cost
+        self.quantity += quantity
+        if (self.quantity > 0) != (direction > 0) and self.quantity != 0:
+            self.cost = abs(self.quantity) * price
+
+    def unrealized_pnl(self, mark_price: Optional[int]) -> int:
+        """P&L of the open quantity marked at ``mark_price`` cash units per contract"""
+        if mark_price is None or self.quantity == 0:
+            return 0
+        return (abs(self.quantity) * mark_price - self.cost) * (1 if self.quantity > 0 else -1)
+
+class Account:
+    """Cash balance, in integer cash units, and positions for one user"""
+    __slots__ = ("user_id", "balance", "positions")
+
+    def __init__(self, user_id: int, balance: int = 0):
+        self.user_id = user_id
+        self.balance = balance
+        self.positions: Dict[str, PositionState] = {}
+
+    def position(self, symbol: str) -> PositionState:
+        position = self.positions.get(symbol)
+        if position is None:
+            position = PositionState(symbol)
+            self.positions[symbol] = position
+        return position
+
+class AccountLedger:
+    """In-memory balances and positions keyed by user id.
+
+    Loaded once at startup and updated synchronously by the matching engine on
+    every fill; the database copy is brought up to date by the persistence
+    writer. Accounts for users the ledger has not seen yet (e.g. registered
+    after startup) are opened on first use. Balances, prices and P&L are in
+    integer cash units (see ``ticks``); the database keeps currency amounts.
+    """
+
+    def __init__(self):
+        self.accounts: Dict[int, Account] = {}
+        self.last_prices: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def load(self, session_factory: Callable[[], Session]):
+        """Load every user's balance and positions, and the last traded prices, from the database"""
+        db = session_factory()
+        try:
+            self.load_rows(db.query(User).all(), db.query(Position).all())
+            for md in db.query(MarketData).all():
+                if md.last_price is not None:
+                    self.last_prices[md.symbol] = to_cash(md.last_price)
+        finally:
+            db.close()
+        print(f"📒 Ledger loaded {len(self.accounts)} accounts")
+
+    def load_rows(self, users: Iterable[User], positions: Iterable[Position]):
+        for user in users:
+            self.accounts[user.id] = Account(user.id, to_cash(user.balance or 0.0))
+        for row in positions:
+            account = self.accounts.get(row.user_id)
+            if account is not None:
+                quantity = row.quantity or 0
+                account.positions[row.symbol] = PositionState(
+                    row.symbol, quantity, to_cash(abs(quantity) * (row.average_price or 0.0)),
+                    to_cash(row.realized_pnl or 0.0)
+                )
+
+    def get(self, user_id: int) -> Optional[Account]:
+        return self.accounts.get(user_id)
+
+    def open_account(self, user_id: int, balance: int = 0) -> Account:
+        """Account for a user, opening it with ``balance`` cash units if the ledger has not seen them"""
+        account = self.accounts.get(user_id)
+        if account is None:
+            account = Account(user_id, balance)
+            self.accounts[user_id] = account
+        return account
+
+    def apply_fill(self, user_id: int, symbol: str, quantity: int, price: int) -> Account:
+        """Apply a signed fill (positive = bought) at ``price`` cash units per contract to a user's cash and position"""
+        account = self.open_account(user_id)
+        account.balance -= quantity * price
+        account.position(symbol).apply(quantity, price)
+        self.last_prices[symbol] = price
+        return account
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.models.models import MarketData
+
+class SymbolStats:
+    """Last, open, high, low and volume for one symbol"""
+    __slots__ = ("symbol", "last_price", "open_price", "high_price", "low_price", "volume", "timestamp")
+
+    def __init__(self, symbol: str, last_price: float, open_price: float, high_price: float,
+                 low_price: float, volume: int = 0, timestamp: Optional[datetime] = None):
+        self.symbol = symbol
+        self.last_price = last_price
+        self.open_price = open_price
+        self.high_price = high_price
+        self.low_price = low_price
+        self.volume = volume
+        self.timestamp = timestamp
+
+    def apply_fill(self, quantity: int, price: float, timestamp: datetime):
+        self.last_price = price
+        self.high_price = max(self.high_price, price)
+        self.low_price = min(self.low_price, price)
+        self.volume += quantity
+        self.timestamp = timestamp
+
+class MarketView:
+    """In-memory market statistics per symbol, kept current by the matching engine.
+
+    Loaded from the market data table at startup and updated on every fill,
+    so market data reads never touch the database. Depth and top of book are
+    read from the engine's books, whose price levels already hold their
+    aggregate quantity and order count.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, SymbolStats] = {}
+
+    def load(self, session_factory: Callable[[], Session]):
+        db = session_factory()
+        try:
+            self.load_rows(db.query(MarketData).all())
+        finally:
+            db.close()
+
+    def load_rows(self, rows: Iterable[MarketData]):
+        for md in rows:
+            if md.last_price is None:
+                continue
+            self.stats[md.symbol] = SymbolStats(
+                md.symbol, md.last_price, md.open_price, md.high_price, md.low_price,
+                md.volume or 0, md.timestamp
+            )
+
+    def get(self, symbol: str) -> Optional[SymbolStats]:
+        return self.stats.get(symbol)
+
+    def record_fill(self, symbol: str, quantity: int, price: float, timestamp: datetime):
+        stats = self.stats.get(symbol)
+        if stats is None:
+            # First trade in a symbol opens its statistics
+            stats = SymbolStats(symbol, price, price, price, price, 0, timestamp)
+            self.stats[symbol] = stats
+        stats.apply_fill(quantity, price, timestamp)
@@ -0,0 +1,233 @@
+import bisect
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from backend.models.models import OrderSide
+from backend.matching_engine.orders import EngineOrder
+from backend.matching_engine.ticks import TickScale
+
+# Aggregated view of one price level: (price in ticks, total quantity, order count)
+Level = Tuple[int, int, int]
+
+class OrderNode:
+    """Link for a resting order inside its price level's queue"""
+    __slots__ = ("order", "level", "prev", "next")
+
+    def __init__(self, order: EngineOrder, level: "PriceLevel"):
+        self.order = order
+        self.level = level
+        self.prev: Optional["OrderNode"] = None
+        self.next: Optional["OrderNode"] = None
+
+class PriceLevel:
+    """FIFO queue of resting orders at a single price.
+
+    Orders are kept in a doubly linked list so that an order can be unlinked
+    from the middle of the queue in constant time given its node.
+    """
+    __slots__ = ("price", "head", "tail", "count", "total_quantity")
+
+    def __init__(self, price: int):
+        self.price = price
+        self.head: Optional[OrderNode] = None
+        self.tail: Optional[OrderNode] = None
+        self.count = 0
+        self.total_quantity = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[EngineOrder]:
+        node = self.head
+        while node is not None:
+            yield node.order
+            node = node.next
+
+    def append(self, order: EngineOrder) -> OrderNode:
+        """Queue an order at the back of the level (time priority)"""
+        node = OrderNode(order, self)
+        if self.tail is None:
+            self.head = node
+        else:
+            node.prev = self.tail
+            self.tail.next = node
+        self.tail = node
+        self.count += 1
+        self.total_quantity += order.remaining_quantity
+        return node
+
+    def unlink(self, node: OrderNode):
+        """Remove an order's node from the queue"""
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+        node.prev = node.next = None
+        self.count -= 1
+        self.total_quantity -= node.order.remaining_quantity
+
+    def reduce(self, quantity: int):
+        """Account for quantity filled or amended away from an order in this level"""
+        self.total_quantity -= quantity
+
+class BookSide:
+    """One side of the book: price levels kept sorted so the best price is last.
+
+    Prices are stored as sort keys (price for bids, -price for asks) so that
+    the best level is always at the end of ``_keys``. Inserting a new level is a
+    binary search, and the best level is cached so reading it is O(1).
+    """
+
+    def __init__(self, side: OrderSide):
+        self.side = side
+        self.levels: Dict[int, PriceLevel] = {}
+        self._keys: List[int] = []
+        self.best: Optional[PriceLevel] = None
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def __iter__(self) -> Iterator[PriceLevel]:
+        """Iterate price levels from best to worst"""
+        for key in reversed(self._keys):
+            yield self.levels[self._price(key)]
+
+    def _key(self, price: int) -> int:
+        return price if self.side == OrderSide.BUY else -price
+
+    def _price(self, key: int) -> int:
+        return key if self.side == OrderSide.BUY else -key
+
+    def add(self, order: EngineOrder) -> OrderNode:
+        """Add a resting order to its price level, creating the level if needed"""
+        level = self.levels.get(order.price)
+        if level is None:
+            level = PriceLevel(order.price)
+            self.levels[order.price] = level
+            key = self._key(order.price)
+            index = bisect.bisect_left(self._keys, key)
+            self._keys.insert(index, key)
+            if index == len(self._keys) - 1:
+                self.best = level
+        return level.append(order)
+
+    def remove(self, node: OrderNode):
+        """Unlink an order from its level, dropping the level once it is empty"""
+        level = node.level
+        level.unlink(node)
+        if not level:
+            self.remove_level(level)
+
+    def remove_level(self, level: PriceLevel):
+        """Drop an empty price level from the side"""
+        del self.levels[level.price]
+        key = self._key(level.price)
+        if self._keys and self._keys[-1] == key:
+            self._keys.pop()
+        else:
+            index = bisect.bisect_left(self._keys, key)
+            del self._keys[index]
+        self.best = self.levels[self._price(self._keys[-1])] if self._keys else None
+
+    def best_price(self) -> Optional[int]:
+        return self.best.price if self.best else None
+
+    def depth(self, levels: int = 10) -> List[Level]:
+        """Aggregated (price, quantity, order count) for the top levels"""
+        result = []
+        for level in self:
+            if len(result) >= levels:
+                break
+            result.append((level.price, level.total_quantity, len(level)))
+        return result
+
+class OrderBook:
+    """Price-time priority limit order book for a single symbol.
+
+    Prices are integer ticks; ``scale`` converts them to and from the
+    contract's decimal prices. ``orders`` indexes every resting order by id to
+    its node, so cancels and amends never search the book.
+
+    Every price level touched by ``add``, ``remove`` or ``reduce`` is noted
+    until ``take_changes`` hands the batch out as one level-2 delta numbered
+    by ``seq``, which only ever increases.
+    """
+
+    def __init__(self, symbol: str, scale: Optional[TickScale] = None):
+        self.symbol = symbol
+        self.scale = scale if scale is not None else TickScale()
+        self.bids = BookSide(OrderSide.BUY)
+        self.asks = BookSide(OrderSide.SELL)
+        self.orders: Dict[int, OrderNode] = {}
+        self.seq = 0
+        self._changed: Set[Tuple[OrderSide, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self.orders
+
+    def get(self, order_id: int) -> Optional[EngineOrder]:
+        node = self.orders.get(order_id)
+        return node.order if node else None
+
+    def add(self, order: EngineOrder) -> OrderNode:
+        """Rest an order on its side of the book"""
+        node = self.side(order.side).add(order)
+        self.orders[order.id] = node
+        self._changed.add((order.side, order.price))
+        return node
+
+    def remove(self, order_id: int) -> Optional[EngineOrder]:
+        """Take a resting order off the book; returns None if it is not resting"""
+        node = self.orders.pop(order_id, None)
+        if node is None:
+            return None
+        self.side(node.order.side).remove(node)
+        self._changed.add((node.order.side, node.level.price))
+        return node.order
+
+    def reduce(self, order_id: int, quantity: int):
+        """Shrink a resting order's level total after a partial fill or size-down"""
+        node = self.orders[order_id]
+        node.level.reduce(quantity)
+        self._changed.add((node.order.side, node.level.price))
+
+    def take_changes(self) -> Optional[Tuple[int, List[Level], List[Level]]]:
+        """Levels changed since the last call, as ``(seq, bids, asks)``.
+
+        Each level carries its new absolute totals, with quantity 0 for a
+        level that is gone, so applying a delta twice is harmless. Returns
+        None, without advancing ``seq``, if nothing changed.
+        """
+        if not self._changed:
+            return None
+        self.seq += 1
+        bids: List[Level] = []
+        asks: List[Level] = []
+        for side, price in self._changed:
+            level = self.side(side).levels.get(price)
+            entry = (price, level.total_quantity, level.count) if level is not None else (price, 0, 0)
+            (bids if side == OrderSide.BUY else asks).append(entry)
+        self._changed.clear()
+        return self.seq, bids, asks
+
+    def side(self, side: OrderSide) -> BookSide:
+        """Book side that resting orders of ``side`` are placed on"""
+        return self.bids if side == OrderSide.BUY else self.asks
+
+    def contra_side(self, side: OrderSide) -> BookSide:
+        """Book side that an incoming order of ``side`` matches against"""
+        return self.asks if side == OrderSide.BUY else self.bids
+
+    @property
+    def best_bid(self) -> Optional[int]:
+        return self.bids.best_price()
+
+    @property
+    def best_ask(self) -> Optional[int]:
+        return self.asks.best_price()
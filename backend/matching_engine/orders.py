@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Optional
+
+from backend.models.models import Order, OrderSide, OrderType, OrderStatus
+from backend.matching_engine.ticks import TickScale
+
+# Largest order quantity; the journal stores quantities as signed 64-bit integers
+MAX_QUANTITY = 2 ** 63 - 1
+
+class EngineOrder:
+    """An order as the matching engine holds it: only the state matching needs.
+
+    A plain ``__slots__`` record, so reading and updating it during matching
+    costs no ORM instrumentation and a resting order carries no session or
+    identity map state. ``price`` is in integer ticks (None for market
+    orders). The database ``Order`` model is only read at startup, through
+    ``from_model``, which converts prices with the contract's TickScale; rows
+    are written by the persistence writer.
+    """
+    __slots__ = ("id", "user_id", "symbol", "side", "order_type", "quantity", "price",
+                 "filled_quantity", "status", "created_at")
+
+    def __init__(self, id: Optional[int], user_id: int, symbol: str, side: OrderSide, order_type: OrderType,
+                 quantity: int, price: Optional[int] = None, filled_quantity: int = 0,
+                 status: OrderStatus = OrderStatus.PENDING, created_at: Optional[datetime] = None):
+        self.id = id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.filled_quantity = filled_quantity
+        self.status = status
+        self.created_at = created_at
+
+    @property
+    def remaining_quantity(self) -> int:
+        return self.quantity - self.filled_quantity
+
+    @property
+    def is_fully_filled(self) -> bool:
+        return self.filled_quantity >= self.quantity
+
+    @classmethod
+    def from_model(cls, order: Order, scale: TickScale) -> "EngineOrder":
+        """Engine copy of a database order, e.g. a resting order loaded at startup.
+
+        A price off the tick grid (entered before the tick size was enforced
+        or changed) moves to the nearest tick.
+        """
+        price = scale.nearest_tick(order.price) if order.price is not None else None
+        return cls(order.id, order.user_id, order.symbol, order.side, order.order_type, order.quantity,
+                   price, order.filled_quantity or 0, order.status or OrderStatus.PENDING, order.created_at)
+
+    def __repr__(self) -> str:
+        return (f"EngineOrder(id={self.id}, {self.side.value} {self.filled_quantity}/{self.quantity} "
+                f"{self.symbol} @ {self.price}, {self.status.value})")
@@ -0,0 +1,404 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models.database import AsyncSessionLocal, write_lock
+from backend.models.models import (
+    Order, Trade, Position, User, MarketData, Candle, JournalProgress, OrderSide, OrderType, OrderStatus
+)
+
+class NewOrder(NamedTuple):
+    """An order accepted by the engine that has no database row yet"""
+    order_id: int
+    user_id: int
+    symbol: str
+    side: OrderSide
+    order_type: OrderType
+    quantity: int
+    price: Optional[float]
+    timestamp: datetime
+
+class OrderUpdate(NamedTuple):
+    """New state of an order after a fill, cancel or amend"""
+    order_id: int
+    status: OrderStatus
+    filled_quantity: int
+    quantity: int
+    price: Optional[float]
+
+class Fill(NamedTuple):
+    """A trade between a buy and a sell order, plus the book's top after it"""
+    symbol: str
+    buy_order_id: int
+    sell_order_id: int
+    buy_user_id: int
+    sell_user_id: int
+    quantity: int
+    price: float
+    best_bid: Optional[float]
+    best_ask: Optional[float]
+    timestamp: datetime
+    trade_id: Optional[int] = None  # id of the buyer's trade row; the seller's is the next
+    aggressor: Optional[OrderSide] = None  # side of the incoming order
+
+class AccountUpdate(NamedTuple):
+    """A user's cash balance after a fill, taken from the in-memory ledger"""
+    user_id: int
+    balance: float
+
+class PositionUpdate(NamedTuple):
+    """A user's position in one symbol after a fill, taken from the in-memory ledger"""
+    user_id: int
+    symbol: str
+    quantity: int
+    average_price: float
+    realized_pnl: float
+
+class CandleUpdate(NamedTuple):
+    """A closed bar, or an open one written at shutdown; replaces any stored bar with the same start"""
+    symbol: str
+    interval: str
+    start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    vwap: float
+    trades: int
+
+PersistenceEvent = Union[NewOrder, OrderUpdate, Fill, AccountUpdate, PositionUpdate, CandleUpdate]
+
+class Commit(NamedTuple):
+    """Everything the engine emitted for one input, covering its journal up to ``seq``.
+
+    Written in a single transaction that also records ``seq``, so the
+    database always stops at an input boundary of the journal.
+    """
+    seq: int
+    events: List[PersistenceEvent]
+
+class InMemoryPersistence:
+    """Persistence stub that keeps engine output in memory instead of a database.
+
+    Used for offline replay and benchmarks. Events are appended to ``events``,
+    or handed to ``on_event`` instead when a callback is given.
+    """
+
+    healthy = True
+
+    def __init__(self, on_event: Optional[Callable[[PersistenceEvent], None]] = None):
+        self.on_event = on_event
+        self.events: List[PersistenceEvent] = []
+
+    async def publish(self, event: PersistenceEvent):
+        if self.on_event is not None:
+            self.on_event(event)
+        else:
+            self.events.append(event)
+
+    async def wait_for_room(self):
+        pass
+
+    def commit(self, seq: int, events: List[PersistenceEvent]):
+        for event in events:
+            if self.on_event is not None:
+                self.on_event(event)
+            else:
+                self.events.append(event)
+
+    async def flush(self):
+        pass
+
+class PersistenceWriter:
+    """Write-behind persistence for matching engine output.
+
+    The engine commits each input's events into a queue and carries on; a
+    single background task drains the queue and writes each batch in one
+    transaction through the async database engine, so matching never waits on
+    a per-fill commit. ``commit`` never waits, so an input's events are queued
+    together with the journal sequence number they cover, and every batch
+    records the latest one in ``journal_progress``: recovery replays the
+    journal past it to rewrite whatever had not been written. The engine calls
+    ``wait_for_room`` before each input instead, so a full queue holds up
+    order entry (back-pressure) rather than growing without bound.
+
+    Order, account and position updates carry absolute state from the engine
+    and its ledger, so they are coalesced per batch (last state wins) and
+    written in bulk; market data rows are loaded once per batch.
+
+    A batch that fails to write is never dropped: it is retried with
+    exponential backoff (``retry_backoff`` up to ``max_retry_backoff``
+    seconds) before anything queued behind it. After ``failure_threshold``
+    failures in a row the writer reports itself unhealthy until a write
+    succeeds again, and the engine stops accepting orders meanwhile.
+    """
+
+    def __init__(self,
+                 session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 max_queue_size: Optional[int] = None,
+                 retry_backoff: float = 0.1,
+                 max_retry_backoff: float = 5.0,
+                 failure_threshold: Optional[int] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or int(os.getenv("PERSIST_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.05"))
+        self.max_queue_size = max_queue_size or int(os.getenv("PERSIST_QUEUE_SIZE", "10000"))
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.failure_threshold = failure_threshold or int(os.getenv("PERSIST_FAILURE_THRESHOLD", "3"))
+        self._task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+        self.events_written = 0
+        self.failed_writes = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        """False while batches keep failing to write"""
+        return self.consecutive_failures < self.failure_threshold
+
+    async def start(self):
+        """Start the background writer task"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the writer"""
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def publish(self, event: PersistenceEvent):
+        """Queue an event for persistence, waiting if the queue is full"""
+        await self.wait_for_room()
+        self.queue.put_nowait(event)
+
+    async def wait_for_room(self):
+        """Wait while the queue is full"""
+        while self.queue.qsize() >= self.max_queue_size:
+            await asyncio.sleep(self.flush_interval)
+
+    def commit(self, seq: int, events: List[PersistenceEvent]):
+        """Queue one input's events as a unit, marking journal sequence number ``seq`` persisted once written"""
+        self.queue.put_nowait(Commit(seq, events))
+
+    async def flush(self):
+        """Wait until every event published so far has been written"""
+        await self.queue.join()
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+
+            # Give a burst a moment to accumulate so it lands in one transaction
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._write_with_retry(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _write_with_retry(self, batch: List[Union[PersistenceEvent, Commit]]):
+        """Write a batch, retrying until it succeeds; the failed transaction is rolled back each time"""
+        events = sum(len(item.events) if isinstance(item, Commit) else 1 for item in batch)
+        while True:
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                self.failed_writes += 1
+                self.consecutive_failures += 1
+                self.last_error = repr(e)
+                delay = min(self.max_retry_backoff, self.retry_backoff * 2 ** (self.consecutive_failures - 1))
+                state = "" if self.healthy else " Order entry is suspended."
+                print(f"❌ Persistence error writing {events} events, retrying in {delay:.1f}s: {e}.{state}")
+                await asyncio.sleep(delay)
+                continue
+            if self.consecutive_failures:
+                print(f"✅ Persistence recovered after {self.consecutive_failures} failed attempts")
+                self.consecutive_failures = 0
+            self.batches_written += 1
+            self.events_written += events
+            return
+
+    async def _write_batch(self, items: List[Union[PersistenceEvent, Commit]]):
+        """Apply a batch of events, and the journal progress of its commits, in a single transaction"""
+        batch: List[PersistenceEvent] = []
+        seq = None
+        for item in items:
+            if isinstance(item, Commit):
+                batch.extend(item.events)
+                seq = item.seq
+            else:
+                batch.append(item)
+        new_orders = [event for event in batch if isinstance(event, NewOrder)]
+        fills = [event for event in batch if isinstance(event, Fill)]
+        order_updates: Dict[int, OrderUpdate] = {}
+        account_updates: Dict[int, AccountUpdate] = {}
+        position_updates: Dict[Tuple[int, str], PositionUpdate] = {}
+        candle_updates: Dict[Tuple[str, str, datetime], CandleUpdate] = {}
+        for event in batch:
+            if isinstance(event, OrderUpdate):
+                order_updates[event.order_id] = event
+            elif isinstance(event, AccountUpdate):
+                account_updates[event.user_id] = event
+            elif isinstance(event, PositionUpdate):
+                position_updates[(event.user_id, event.symbol)] = event
+            elif isinstance(event, CandleUpdate):
+                candle_updates[(event.symbol, event.interval, event.start)] = event
+
+        async with write_lock(), self.session_factory() as db:
+            # Write before reading, so the transaction takes the write lock up
+            # front instead of upgrading from a read (which SQLite can refuse).
+            # New orders go first: later events in the batch update their rows.
+            if seq is not None:
+                await db.execute(update(JournalProgress).where(JournalProgress.id == 1).values(seq=seq))
+            if new_orders:
+                await db.execute(insert(Order), [
+                    {
+                        "id": o.order_id,
+                        "user_id": o.user_id,
+                        "symbol": o.symbol,
+                        "side": o.side,
+                        "order_type": o.order_type,
+                        "quantity": o.quantity,
+                        "price": o.price,
+                        "filled_quantity": 0,
+                        "status": OrderStatus.PENDING,
+                        "created_at": o.timestamp,
+                    }
+                    for o in new_orders
+                ])
+            if order_updates:
+                await db.execute(update(Order), [
+                    {
+                        "id": u.order_id,
+                        "status": u.status,
+                        "filled_quantity": u.filled_quantity,
+                        "quantity": u.quantity,
+                        "price": u.price,
+                    }
+                    for u in order_updates.values()
+                ])
+            if account_updates:
+                await db.execute(update(User), [
+                    {"id": u.user_id, "balance": u.balance}
+                    for u in account_updates.values()
+                ])
+            if fills:
+                await self._write_fills(db, fills)
+            if position_updates:
+                await self._write_positions(db, position_updates)
+            if candle_updates:
+                await self._write_candles(db, candle_updates)
+            await db.commit()
+
+    async def _write_fills(self, db: AsyncSession, fills: List[Fill]):
+        symbols = {f.symbol for f in fills}
+        market_data = {
+            md.symbol: md
+            for md in (await db.execute(select(MarketData).where(MarketData.symbol.in_(symbols)))).scalars()
+        }
+
+        for fill in fills:
+            trade_value = fill.quantity * fill.price
+
+            # Create trade records for both users
+            for offset, user_id in enumerate((fill.buy_user_id, fill.sell_user_id)):
+                db.add(Trade(
+                    id=fill.trade_id + offset if fill.trade_id is not None else None,
+                    buy_order_id=fill.buy_order_id,
+                    sell_order_id=fill.sell_order_id,
+                    user_id=user_id,
+                    symbol=fill.symbol,
+                    quantity=fill.quantity,
+                    price=fill.price,
+                    trade_value=trade_value,
+                    aggressor_side=fill.aggressor,
+                    created_at=fill.timestamp
+                ))
+
+            md = market_data.get(fill.symbol)
+            if md is None:
+                # First trade in a newly listed symbol opens its market data row
+                md = MarketData(
+                    symbol=fill.symbol,
+                    last_price=fill.price,
+                    volume=0,
+                    open_price=fill.price,
+                    high_price=fill.price,
+                    low_price=fill.price
+                )
+                db.add(md)
+                market_data[fill.symbol] = md
+            md.last_price = fill.price
+            md.volume += fill.quantity
+            md.high_price = max(md.high_price, fill.price)
+            md.low_price = min(md.low_price, fill.price)
+            md.bid_price = fill.best_bid
+            md.ask_price = fill.best_ask
+            md.timestamp = fill.timestamp
+
+    async def _write_positions(self, db: AsyncSession, updates: Dict[Tuple[int, str], PositionUpdate]):
+        """Upsert position rows from ledger state"""
+        user_ids = {user_id for user_id, _ in updates}
+        symbols = {symbol for _, symbol in updates}
+        positions = {
+            (p.user_id, p.symbol): p
+            for p in (await db.execute(
+                select(Position).where(Position.user_id.in_(user_ids), Position.symbol.in_(symbols))
+            )).scalars()
+        }
+
+        for key, u in updates.items():
+            position = positions.get(key)
+            if position is None:
+                position = Position(user_id=u.user_id, symbol=u.symbol)
+                db.add(position)
+            position.quantity = u.quantity
+            position.average_price = u.average_price
+            position.realized_pnl = u.realized_pnl
+
+    async def _write_candles(self, db: AsyncSession, updates: Dict[Tuple[str, str, datetime], CandleUpdate]):
+        """Upsert bars by symbol, interval and start"""
+        candles = {
+            (c.symbol, c.interval, c.start): c
+            for c in (await db.execute(select(Candle).where(
+                Candle.symbol.in_({symbol for symbol, _, _ in updates}),
+                Candle.interval.in_({interval for _, interval, _ in updates}),
+                Candle.start.in_({start for _, _, start in updates})
+            ))).scalars()
+        }
+
+        for key, u in updates.items():
+            candle = candles.get(key)
+            if candle is None:
+                candle = Candle(symbol=u.symbol, interval=u.interval, start=u.start)
+                db.add(candle)
+            candle.open = u.open
+            candle.high = u.high
+            candle.low = u.low
+            candle.close = u.close
+            candle.volume = u.volume
+            candle.vwap = u.vwap
+            candle.trades = u.trades
@@ -0,0 +1,208 @@
+import os
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from backend.models.models import OrderSide, OrderType
+from backend.matching_engine.orders import EngineOrder
+from backend.matching_engine.order_book import OrderBook
+from backend.matching_engine.ledger import AccountLedger
+from backend.matching_engine.ticks import TickScale, to_cash
+
+def _env_limit(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "", "0") else None
+
+class RiskLimits(NamedTuple):
+    """Per-user pre-trade limits; None means unlimited"""
+    max_order_quantity: Optional[int] = None
+    max_open_orders: Optional[int] = None
+    max_open_notional: Optional[float] = None
+    max_position: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "RiskLimits":
+        return cls(
+            max_order_quantity=_env_limit("RISK_MAX_ORDER_QUANTITY", int),
+            max_open_orders=_env_limit("RISK_MAX_OPEN_ORDERS", int),
+            max_open_notional=_env_limit("RISK_MAX_OPEN_NOTIONAL", float),
+            max_position=_env_limit("RISK_MAX_POSITION", int),
+        )
+
+class RiskRejected(ValueError):
+    """An order would breach a pre-trade check"""
+
+class OrderReservation:
+    """What one resting order is holding back from its user"""
+    __slots__ = ("user_id", "symbol", "side", "price", "remaining")
+
+    def __init__(self, user_id: int, symbol: str, side: OrderSide, price: int, remaining: int):
+        self.user_id = user_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.remaining = remaining
+
+    @property
+    def notional(self) -> int:
+        return self.remaining * self.price
+
+class Exposure:
+    """A user's totals across all of their resting orders"""
+    __slots__ = ("reserved_cash", "open_orders", "open_notional", "buy_quantity", "sell_quantity")
+
+    def __init__(self):
+        self.reserved_cash = 0
+        self.open_orders = 0
+        self.open_notional = 0
+        self.buy_quantity: Dict[str, int] = {}
+        self.sell_quantity: Dict[str, int] = {}
+
+    def apply(self, reservation: OrderReservation, quantity: int, orders: int):
+        """Add (positive) or release (negative) ``quantity`` of a reservation"""
+        notional = quantity * reservation.price
+        self.open_orders += orders
+        self.open_notional += notional
+        if reservation.side == OrderSide.BUY:
+            self.reserved_cash += notional
+            self.buy_quantity[reservation.symbol] = self.buy_quantity.get(reservation.symbol, 0) + quantity
+        else:
+            self.sell_quantity[reservation.symbol] = self.sell_quantity.get(reservation.symbol, 0) + quantity
+
+def estimate_market_cost(book: OrderBook, side: OrderSide, quantity: int) -> int:
+    """Cost in cash units of filling ``quantity`` against the current contra side, as far as it is deep enough"""
+    ticks = 0
+    for level in book.contra_side(side):
+        take = min(quantity, level.total_quantity)
+        ticks += take * level.price
+        quantity -= take
+        if quantity == 0:
+            break
+    return book.scale.to_cash(ticks)
+
+class PreTradeRisk:
+    """In-memory pre-trade risk checks backed by per-order reservations.
+
+    Every resting limit order reserves its remaining size: cash at its limit
+    price for buys, quantity for sells. Reservations are taken when the engine
+    accepts an order and released as it fills, is cancelled or is amended, so
+    checking a new order is O(1) and never touches the database. Cash is
+    checked against the ledger balance less what is already reserved; market
+    buys are priced by walking the book they will trade against. Cash and
+    notional are integer cash units; ``RiskLimits.max_open_notional`` is in
+    currency.
+    """
+
+    def __init__(self, ledger: AccountLedger, limits: Optional[RiskLimits] = None):
+        self.ledger = ledger
+        self.default_limits = limits or RiskLimits.from_env()
+        self.user_limits: Dict[int, RiskLimits] = {}
+        self.exposures: Dict[int, Exposure] = {}
+        self.reservations: Dict[int, OrderReservation] = {}
+
+    def limits_for(self, user_id: int) -> RiskLimits:
+        return self.user_limits.get(user_id, self.default_limits)
+
+    def set_limits(self, user_id: int, limits: Optional[RiskLimits]):
+        """Override the default limits for one user (None restores the defaults)"""
+        if limits is None:
+            self.user_limits.pop(user_id, None)
+        else:
+            self.user_limits[user_id] = limits
+
+    def exposure(self, user_id: int) -> Exposure:
+        exposure = self.exposures.get(user_id)
+        if exposure is None:
+            exposure = Exposure()
+            self.exposures[user_id] = exposure
+        return exposure
+
+    def available_cash(self, user_id: int) -> int:
+        account = self.ledger.get(user_id)
+        balance = account.balance if account is not None else 0
+        return balance - self.exposure(user_id).reserved_cash
+
+    def check(self, order: EngineOrder, book: OrderBook, quantity: Optional[int] = None, price: Optional[int] = None):
+        """Raise RiskRejected if ``order`` may not be accepted.
+
+        ``quantity`` and ``price`` (in ticks) check an amendment of a resting
+        order to those values instead; its current reservation is credited
+        back first.
+        """
+        quantity = order.quantity if quantity is None else quantity
+        price = order.price if price is None else price
+        remaining = quantity - (order.filled_quantity or 0)
+        limits = self.limits_for(order.user_id)
+        exposure = self.exposure(order.user_id)
+        current = self.reservations.get(order.id) if order.id is not None else None
+
+        if limits.max_order_quantity is not None and quantity > limits.max_order_quantity:
+            raise RiskRejected(f"Order quantity {quantity} exceeds the limit of {limits.max_order_quantity}.")
+
+        if order.order_type == OrderType.MARKET:
+            notional = estimate_market_cost(book, order.side, remaining)
+        else:
+            if price is None or price <= 0:
+                # A non-positive price would reserve negative cash
+                raise RiskRejected("Price must be positive.")
+            notional = book.scale.to_cash(remaining * price)
+            open_orders = exposure.open_orders + (0 if current else 1)
+            if limits.max_open_orders is not None and open_orders > limits.max_open_orders:
+                raise RiskRejected(f"Open order limit of {limits.max_open_orders} reached.")
+            open_notional = exposure.open_notional + notional - (current.notional if current else 0)
+            if limits.max_open_notional is not None and open_notional > to_cash(limits.max_open_notional):
+                raise RiskRejected(f"Open notional would exceed the limit of {limits.max_open_notional}.")
+
+        if order.side == OrderSide.BUY:
+            released = current.notional if current else 0
+            if notional - released > self.available_cash(order.user_id):
+                raise RiskRejected("Insufficient balance.")
+
+        if limits.max_position is not None:
+            account = self.ledger.get(order.user_id)
+            position = account.positions.get(order.symbol) if account is not None else None
+            held = position.quantity if position is not None else 0
+            released = current.remaining if current else 0
+            if order.side == OrderSide.BUY:
+                worst = held + exposure.buy_quantity.get(order.symbol, 0) - released + remaining
+            else:
+                worst = -held + exposure.sell_quantity.get(order.symbol, 0) - released + remaining
+            if worst > limits.max_position:
+                raise RiskRejected(f"Position could exceed the limit of {limits.max_position}.")
+
+    def reserve(self, order: EngineOrder, scale: TickScale):
+        """Hold back the unfilled part of a limit order, priced with its book's ``scale``"""
+        if order.order_type != OrderType.LIMIT or order.id in self.reservations:
+            return
+        remaining = order.quantity - (order.filled_quantity or 0)
+        if remaining <= 0:
+            return
+        if order.price is None or order.price <= 0:
+            raise RiskRejected(f"Order {order.id} has no positive price to reserve against.")
+        reservation = OrderReservation(order.user_id, order.symbol, order.side, scale.to_cash(order.price), remaining)
+        self.reservations[order.id] = reservation
+        self.exposure(order.user_id).apply(reservation, remaining, 1)
+
+    def release(self, order_id: int, quantity: Optional[int] = None):
+        """Release ``quantity`` (default: all) of an order's reservation, after a fill or cancel"""
+        reservation = self.reservations.get(order_id)
+        if reservation is None:
+            return
+        quantity = reservation.remaining if quantity is None else min(quantity, reservation.remaining)
+        reservation.remaining -= quantity
+        done = reservation.remaining == 0
+        self.exposure(reservation.user_id).apply(reservation, -quantity, -1 if done else 0)
+        if done:
+            del self.reservations[order_id]
+
+    def rebuild(self, books: Iterable[OrderBook]):
+        """Recompute every reservation from the orders resting on the books"""
+        self.exposures.clear()
+        self.reservations.clear()
+        for book in books:
+            for side in (book.bids, book.asks):
+                for level in side:
+                    for order in level:
+                        try:
+                            self.reserve(order, book.scale)
+                        except RiskRejected as e:
+                            # Only possible for orders that rested before prices were checked
+                            print(f"⚠️ {e}")
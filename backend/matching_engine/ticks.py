@@ -0,0 +1,65 @@
+from decimal import Decimal
+import math
+
+# Tick size of a contract with no ContractSpec, matching the model's default
+DEFAULT_TICK_SIZE = 0.1
+
+# Cash is held as an integer number of 1/CASH_SCALE currency units
+CASH_SCALE = 10_000
+
+# Largest price in ticks; the journal stores prices as signed 64-bit integers
+MAX_TICKS = 2 ** 63 - 1
+
+def to_cash(amount: float) -> int:
+    """Currency amount in integer cash units"""
+    return round(amount * CASH_SCALE)
+
+def from_cash(units: float) -> float:
+    """Cash units back to a currency amount"""
+    return units / CASH_SCALE
+
+class TickScale:
+    """Conversion between one contract's decimal prices and integer ticks.
+
+    Inside the engine a price is a whole number of ticks, so price levels are
+    exact dict keys and comparisons are integer comparisons. ``tick_value`` is
+    the cash, in integer cash units, that one tick is worth per contract.
+    Decimal prices only exist at the edges: order entry, market data,
+    WebSocket messages and the database.
+    """
+    __slots__ = ("tick_size", "tick_value", "decimals")
+
+    def __init__(self, tick_size: float = DEFAULT_TICK_SIZE):
+        if not tick_size or tick_size <= 0:
+            raise ValueError(f"Tick size must be positive, not {tick_size}.")
+        tick_value = round(tick_size * CASH_SCALE)
+        if tick_value == 0 or abs(tick_value - tick_size * CASH_SCALE) > 1e-6:
+            raise ValueError(f"Tick size {tick_size} is not a whole number of cash units (1/{CASH_SCALE}).")
+        self.tick_size = tick_size
+        self.tick_value = tick_value
+        # Digits after the decimal point, so prices print as entered (49.9, not 49.900000000000006)
+        self.decimals = max(0, -Decimal(str(tick_size)).normalize().as_tuple().exponent)
+
+    def to_ticks(self, price: float) -> int:
+        """Ticks for an order price, raising ValueError if it is not a positive price on the tick grid"""
+        if not math.isfinite(price):
+            raise ValueError(f"Price {price} is not a finite number.")
+        ticks = round(price / self.tick_size)
+        if abs(ticks * self.tick_size - price) > 1e-9 * max(1.0, abs(price)):
+            raise ValueError(f"Price {price} is not a multiple of the tick size {self.tick_size}.")
+        if ticks <= 0:
+            raise ValueError("Price must be positive.")
+        if ticks > MAX_TICKS:
+            raise ValueError(f"Price {price} is too large.")
+        return ticks
+
+    def nearest_tick(self, price: float) -> int:
+        """Ticks for the grid price closest to ``price``"""
+        return round(price / self.tick_size)
+
+    def to_price(self, ticks: int) -> float:
+        return round(ticks * self.tick_size, self.decimals)
+
+    def to_cash(self, ticks: int) -> int:
+        """Cash units per contract at a price of ``ticks``"""
+        return ticks * self.tick_value
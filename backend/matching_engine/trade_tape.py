@@ -0,0 +1,111 @@
+import os
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session
+
+from backend.models.models import Trade, OrderSide
+
+class Print:
+    """One public trade as seen by the market: no order or user ids"""
+    __slots__ = ("id", "symbol", "price", "quantity", "side", "timestamp")
+
+    def __init__(self, id: int, symbol: str, price: float, quantity: int, side: OrderSide, timestamp: datetime):
+        self.id = id
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        self.side = side  # the aggressor's side
+        self.timestamp = timestamp
+
+def prints_query(symbol: str, limit: int, before: Optional[int] = None):
+    """Latest prints of a symbol from the trades table, newest first.
+
+    Every fill is stored as one row per side, the buyer's first, so the
+    lowest id of the pair is the print's id. Both rows record the aggressor's
+    side.
+    """
+    first_id = func.min(Trade.id)
+    query = select(first_id, Trade.price, Trade.quantity, Trade.created_at, Trade.buy_order_id, Trade.sell_order_id,
+                   func.max(Trade.aggressor_side)) \
+        .where(Trade.symbol == symbol)
+    if before is not None:
+        query = query.where(Trade.id < before)
+    return query.group_by(Trade.buy_order_id, Trade.sell_order_id, Trade.created_at) \
+        .order_by(desc(first_id)).limit(limit)
+
+def print_from_row(symbol: str, row) -> Print:
+    trade_id, price, quantity, created_at, buy_order_id, sell_order_id, side = row
+    if side is None:
+        # Rows written before the aggressor was stored: the later order usually crossed
+        side = OrderSide.BUY if buy_order_id > sell_order_id else OrderSide.SELL
+    elif not isinstance(side, OrderSide):
+        side = OrderSide[side]
+    return Print(trade_id, symbol, price, quantity, side, created_at)
+
+class TradeTape:
+    """Fixed-capacity ring buffer of recent prints per symbol, filled by the engine.
+
+    Holds the last ``capacity`` prints of every symbol (``TRADE_TAPE_SIZE``,
+    default 1000), so recent-trade queries never touch the database. The tape
+    also hands out trade ids: the id of the buyer's trade row, which the
+    persistence writer inserts with that id and the seller's with the next,
+    so ids read from the tape and from the table agree.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or int(os.getenv("TRADE_TAPE_SIZE", "1000"))
+        self.prints: Dict[str, Deque[Print]] = {}
+        # Symbols with older prints in the database than the tape holds
+        self.truncated: Set[str] = set()
+        self.next_id = 1
+
+    def load(self, session_factory: Callable[[], Session]):
+        """Continue trade ids after the database's, and fill the tape with each symbol's latest prints"""
+        db = session_factory()
+        try:
+            self.next_id = (db.execute(select(func.max(Trade.id))).scalar() or 0) + 1
+            for symbol in db.execute(select(Trade.symbol).distinct()).scalars():
+                rows = db.execute(prints_query(symbol, self.capacity + 1)).all()
+                if len(rows) > self.capacity:
+                    self.truncated.add(symbol)
+                buffer = self._buffer(symbol)
+                for row in reversed(rows[:self.capacity]):
+                    buffer.append(print_from_row(symbol, row))
+        finally:
+            db.close()
+
+    def _buffer(self, symbol: str) -> Deque[Print]:
+        buffer = self.prints.get(symbol)
+        if buffer is None:
+            buffer = deque(maxlen=self.capacity)
+            self.prints[symbol] = buffer
+        return buffer
+
+    def record(self, symbol: str, price: float, quantity: int, side: OrderSide, timestamp: datetime) -> Print:
+        """Add a print and assign its trade id"""
+        trade = Print(self.next_id, symbol, price, quantity, side, timestamp)
+        # Two trade rows per fill: the buyer's and the seller's
+        self.next_id += 2
+        buffer = self._buffer(symbol)
+        if len(buffer) == self.capacity:
+            self.truncated.add(symbol)
+        buffer.append(trade)
+        return trade
+
+    def recent(self, symbol: str, limit: int, before: Optional[int] = None) -> Tuple[List[Print], bool]:
+        """Up to ``limit`` latest prints with id below ``before``, newest first.
+
+        The flag is False when older prints than the tape holds may exist in
+        the database, and fewer than ``limit`` were found here.
+        """
+        result = []
+        for trade in reversed(self.prints.get(symbol, ())):
+            if before is not None and trade.id >= before:
+                continue
+            result.append(trade)
+            if len(result) == limit:
+                return result, True
+        return result, symbol not in self.truncated
@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, inspect, text, MetaData
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import AsyncIterator, Optional
+import asyncio
+import contextlib
 import os
+import weakref
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cu_quants_exchange.db")
@@ -15,14 +20,56 @@ engine = create_engine(
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """Same database through an asyncio driver (aiosqlite for SQLite, asyncpg for Postgres)"""
+    for sync_prefix, async_prefix in (("sqlite://", "sqlite+aiosqlite://"),
+                                      ("postgresql://", "postgresql+asyncpg://"),
+                                      ("postgres://", "postgresql+asyncpg://")):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+# Async engine used by the API and the persistence writer; the sync engine
+# above is only used at startup and by scripts
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **({} if "sqlite" in ASYNC_DATABASE_URL else {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_pre_ping": True,
+    })
+)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _enable_sqlite_wal(dbapi_connection, connection_record):
+        # WAL lets API reads proceed while the persistence writer holds the write lock
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+# Objects stay usable after commit: orders handed to the matching engine
+# outlive the request's session
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
 def init_db():
     """Initialize database tables"""
-    from backend.models.models import User, Order, Trade, Position, MarketData, AttendanceRecord
+    from backend.models.models import (
+        User, Order, Trade, Position, MarketData, Candle, AttendanceRecord, ContractSpec, JournalProgress
+    )
     Base.metadata.create_all(bind=engine)
     
+    # create_all does not add columns to tables that already exist
+    trade_columns = {column["name"] for column in inspect(engine).get_columns("trades")}
+    if "aggressor_side" not in trade_columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE trades ADD COLUMN aggressor_side VARCHAR(4)"))
+    
     # Create default admin user and initial market data
     db = SessionLocal()
     try:
@@ -54,6 +101,11 @@ def init_db():
             )
             db.add(initial_market_data)
             
+        # List the CQAF contract; further contracts/expiries are added as extra rows
+        contract_spec = db.query(ContractSpec).filter(ContractSpec.symbol == "CQAF").first()
+        if not contract_spec:
+            db.add(ContractSpec(symbol="CQAF"))
+            
         db.commit()
         print("✅ Database initialized successfully")
         
@@ -63,8 +115,95 @@ def init_db():
     finally:
         db.close()
 
+def get_listed_symbols():
+    """Symbols of all active contracts"""
+    from backend.models.models import ContractSpec
+    db = SessionLocal()
+    try:
+        specs = db.query(ContractSpec).filter(ContractSpec.is_active == True).all()
+        return [spec.symbol.upper() for spec in specs]
+    finally:
+        db.close()
+
+def get_tick_sizes():
+    """Tick size of every active contract that sets one, by symbol"""
+    from backend.models.models import ContractSpec
+    db = SessionLocal()
+    try:
+        specs = db.query(ContractSpec).filter(ContractSpec.is_active == True).all()
+        return {spec.symbol.upper(): spec.tick_size for spec in specs if spec.tick_size}
+    finally:
+        db.close()
+
+def get_resting_orders():
+    """Open limit orders in id (arrival) order, used to seed the engine's books"""
+    from backend.models.models import Order, OrderType, OrderStatus
+    db = SessionLocal()
+    try:
+        return db.query(Order).filter(
+            Order.order_type == OrderType.LIMIT,
+            Order.status.in_([OrderStatus.PENDING, OrderStatus.PARTIAL])
+        ).order_by(Order.id).all()
+    finally:
+        db.close()
+
+def get_last_order_id() -> int:
+    """Highest order id in the database, so the engine continues numbering after it"""
+    from sqlalchemy import func
+    from backend.models.models import Order
+    db = SessionLocal()
+    try:
+        return db.query(func.max(Order.id)).scalar() or 0
+    finally:
+        db.close()
+
+def get_persisted_seq() -> Optional[int]:
+    """Last matching engine journal sequence number whose output is in the database.
+
+    None if the database has never recorded one, i.e. it was last written
+    before journal progress was tracked.
+    """
+    from backend.models.models import JournalProgress
+    db = SessionLocal()
+    try:
+        progress = db.get(JournalProgress, 1)
+        return progress.seq if progress is not None else None
+    finally:
+        db.close()
+
+def set_persisted_seq(seq: int):
+    """Record where the database stands in a journal, e.g. 0 when a new journal is started"""
+    from backend.models.models import JournalProgress
+    db = SessionLocal()
+    try:
+        db.merge(JournalProgress(id=1, seq=seq))
+        db.commit()
+    finally:
+        db.close()
+
+_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def write_lock():
+    """Serialize write transactions in-process on SQLite, which only has one writer.
+
+    Waiting on an asyncio lock is much cheaper than SQLite's busy handler,
+    which sleep-polls for the file lock. Other databases get a no-op.
+    """
+    if not ASYNC_DATABASE_URL.startswith("sqlite"):
+        return contextlib.nullcontext()
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency to get an async database session from the pool"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_db():
-    """Dependency to get database session"""
+    """Synchronous database session, for scripts and tools outside the event loop"""
     db = SessionLocal()
     try:
         yield db
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.models.database import Base
@@ -54,7 +54,7 @@ class Order(Base):
     
     # Relationships
     user = relationship("User", back_populates="orders")
-    trades = relationship("Trade", back_populates="order")
+    trades = relationship("Trade", back_populates="order", foreign_keys="Trade.buy_order_id")
     
     @property
     def remaining_quantity(self):
@@ -75,6 +75,7 @@ class Trade(Base):
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
     trade_value = Column(Float, nullable=False)  # quantity * price
+    aggressor_side = Column(Enum(OrderSide), nullable=True)  # Side of the order that took liquidity
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
@@ -110,6 +111,24 @@ class MarketData(Base):
     low_price = Column(Float, nullable=False)
     timestamp = Column(DateTime, server_default=func.now())
 
+class Candle(Base):
+    """OHLCV+VWAP bar for one symbol and interval, written when the bar closes"""
+    __tablename__ = "candles"
+    # Also the index that range queries use
+    __table_args__ = (UniqueConstraint("symbol", "interval", "start", name="uq_candle_symbol_interval_start"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False)
+    interval = Column(String, nullable=False)  # 1s, 1m, 5m, 1h or 1d
+    start = Column(DateTime, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Integer, default=0)
+    vwap = Column(Float, nullable=False)
+    trades = Column(Integer, default=0)
+
 class AttendanceRecord(Base):
     """Records actual meeting attendance for CQAF settlement"""
     __tablename__ = "attendance_records"
@@ -135,4 +154,10 @@ class ContractSpec(Base):
     expiry_date = Column(DateTime, nullable=True)
     settlement_price = Column(Float, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, server_default=func.now())
+class JournalProgress(Base):
+    """How far into the matching engine's journal the database is written; a single row"""
+    __tablename__ = "journal_progress"
+    
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)  # last journal sequence number whose output is stored
@@ -1,22 +1,186 @@
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import Deque, Dict, Optional, Set, Tuple
+from collections import deque
+import asyncio
 import json
+import os
+
+from backend.matching_engine.candles import CANDLE_INTERVALS
+
+SLOW_CONSUMER_POLICIES = ("drop", "conflate", "disconnect")
+CHANNEL_TYPES = ("trades", "book", "ticker", "candles")
+
+def parse_channel(channel: str) -> Tuple[str, str, Optional[str]]:
+    """Split ``<type>:<symbol>`` (``candles:<symbol>:<interval>`` for bars) into
+    type, symbol and interval, raising ValueError if it is malformed"""
+    kind, _, rest = channel.partition(":")
+    symbol, _, interval = rest.partition(":")
+    if kind not in CHANNEL_TYPES or not symbol or bool(interval) != (kind == "candles"):
+        raise ValueError(f"Unknown channel '{channel}'; expected trades:<symbol>, book:<symbol>, "
+                         f"ticker:<symbol> or candles:<symbol>:<interval>")
+    if interval and interval not in CANDLE_INTERVALS:
+        raise ValueError(f"Unknown candle interval '{interval}'; expected one of {', '.join(CANDLE_INTERVALS)}")
+    return kind, symbol.upper(), interval or None
+
+def format_channel(kind: str, symbol: str, interval: Optional[str] = None) -> str:
+    return f"{kind}:{symbol}:{interval}" if interval else f"{kind}:{symbol}"
+
+class ClientConnection:
+    """A connected socket with its own bounded outbound queue and writer task.
+
+    Messages are queued without waiting and written by the connection's own
+    task, so a slow client only ever delays itself. When the queue is full
+    the slow-consumer policy decides what happens: ``drop`` discards the new
+    message, ``conflate`` discards the oldest queued message so the client
+    catches up on the latest state, and ``disconnect`` closes the socket.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager", max_queue_size: int, policy: str):
+        self.websocket = websocket
+        self.manager = manager
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.queue: Deque[str] = deque()
+        self.channels: Set[str] = set()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.task = asyncio.create_task(self._writer())
+
+    def offer(self, payload: str):
+        """Queue an encoded message for this client without waiting"""
+        if self.closed:
+            return
+        if len(self.queue) >= self.max_queue_size:
+            if self.policy == "disconnect":
+                self.manager.slow_disconnects += 1
+                self.manager.disconnect(self.websocket, reason="slow consumer")
+                return
+            self.dropped += 1
+            self.manager.messages_dropped += 1
+            if self.policy == "drop":
+                return
+            self.queue.popleft()
+        self.queue.append(payload)
+        self.ready.set()
+
+    async def _writer(self):
+        try:
+            while True:
+                await self.ready.wait()
+                while self.queue:
+                    await self.websocket.send_text(self.queue.popleft())
+                    self.sent += 1
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; stop queueing for it
+            self.manager.disconnect(self.websocket)
+
+    def close(self, reason: Optional[str] = None):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+        if reason is not None:
+            asyncio.create_task(self._close_socket(reason))
+
+    async def _close_socket(self, reason: str):
+        try:
+            await self.websocket.close(code=1008, reason=reason)
+        except Exception:
+            pass
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Fans out messages to connected WebSocket clients.
+
+    Clients subscribe to channels such as ``trades:CQAF``; the manager keeps
+    a channel -> subscribers index so ``publish`` only touches the sockets
+    that asked for a channel, and publishers can skip building messages for
+    channels nobody is watching. Each message is encoded once and handed to
+    every recipient's queue; neither ``publish`` nor ``broadcast`` waits on
+    network I/O. Queue depth and the
+    slow-consumer policy come from ``WS_QUEUE_SIZE`` (default 1000 messages)
+    and ``WS_SLOW_CONSUMER_POLICY`` (``drop``, ``conflate`` or ``disconnect``,
+    the default).
+    """
+
+    def __init__(self, max_queue_size: Optional[int] = None, slow_consumer_policy: Optional[str] = None):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.subscribers: Dict[str, Set[ClientConnection]] = {}
+        self.max_queue_size = max_queue_size or int(os.getenv("WS_QUEUE_SIZE", "1000"))
+        self.slow_consumer_policy = slow_consumer_policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")
+        if self.slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy '{self.slow_consumer_policy}'")
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> ClientConnection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = ClientConnection(websocket, self, self.max_queue_size, self.slow_consumer_policy)
+        self.active_connections[websocket] = connection
+        return connection
+
+    def disconnect(self, websocket: WebSocket, reason: Optional[str] = None):
+        """Forget a client; safe to call more than once. With ``reason``, also close its socket."""
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            for channel in list(connection.channels):
+                self._remove_subscriber(connection, channel)
+            connection.close(reason)
+
+    def subscribe(self, websocket: WebSocket, channel: str) -> str:
+        """Add a client to a channel; returns the normalised channel name"""
+        channel = format_channel(*parse_channel(channel))
+        connection = self.active_connections.get(websocket)
+        if connection is not None and channel not in connection.channels:
+            connection.channels.add(channel)
+            self.subscribers.setdefault(channel, set()).add(connection)
+        return channel
+
+    def unsubscribe(self, websocket: WebSocket, channel: str) -> str:
+        channel = format_channel(*parse_channel(channel))
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._remove_subscriber(connection, channel)
+        return channel
+
+    def _remove_subscriber(self, connection: ClientConnection, channel: str):
+        connection.channels.discard(channel)
+        subscribers = self.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.subscribers[channel]
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self.subscribers
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for a single client"""
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            connection.offer(json.dumps(message))
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    async def publish(self, channel: str, message: dict):
+        """Send a message to the subscribers of one channel"""
+        subscribers = self.subscribers.get(channel)
+        if not subscribers:
+            return
+        payload = json.dumps(message)
+        for connection in list(subscribers):
+            connection.offer(payload)
+        await asyncio.sleep(0)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception:
-                # Handle broken connections
-                pass 
\ No newline at end of file
+        """Send a message to every connected client, whatever it subscribed to"""
+        payload = json.dumps(message)
+        for connection in list(self.active_connections.values()):
+            connection.offer(payload)
+        # Give the writers a turn, so a burst of broadcasts from one caller
+        # does not fill every queue before any of them is drained
+        await asyncio.sleep(0)
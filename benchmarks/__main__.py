@@ -0,0 +1,52 @@
+"""
+Benchmark suite for the matching engine and the REST/WebSocket stack.
+
+Usage:
+    python -m benchmarks                         # everything
+    python -m benchmarks --suite engine --quick  # fast engine-only run
+    python -m benchmarks --output after.json --compare before.json
+
+Results are written as JSON so runs can be compared; --compare prints the
+change for every metric and exits non-zero if anything regressed by more than
+--threshold.
+"""
+
+import argparse
+import sys
+
+from benchmarks.common import Results, compare, isolate_storage
+
+# The backend reads DATABASE_URL on import, so redirect storage first
+isolate_storage()
+
+from benchmarks import bench_api, bench_engine
+
+SUITES = {
+    "engine": bench_engine.run,
+    "api": bench_api.run,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="QuantX Exchange benchmark suite.")
+    parser.add_argument("--suite", choices=["all"] + list(SUITES), default="all")
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads for a fast sanity run.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Previous results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression.")
+    args = parser.parse_args()
+
+    results = Results()
+    for name, run in SUITES.items():
+        if args.suite in ("all", name):
+            run(results, quick=args.quick)
+
+    results.write(args.output)
+
+    if args.compare:
+        regressions = compare(args.compare, results.to_dict(), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+End-to-end benchmarks through the FastAPI app: order entry (single, batched
+and over an order-entry session) and market data read latency via an in-process ASGI client, login latency during a login burst along with the
+order entry latency other users see meanwhile, and WebSocket broadcast fan-out
+to N connected clients.
+
+The app runs against the throwaway database and journal directory set up by
+``benchmarks.common.isolate_storage``, so it never touches real exchange data.
+"""
+
+import asyncio
+import time
+from typing import List
+
+from benchmarks.common import Results, Timer, percentiles
+
+class FakeWebSocket:
+    """Stand-in for a connected client that records delivery times"""
+
+    def __init__(self, delivered: "FanoutTracker", stalled: bool = False):
+        self.delivered = delivered
+        self.stalled = stalled
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+    async def send_text(self, data: str):
+        if self.stalled:
+            # A client that stopped reading: the send never completes
+            await asyncio.Event().wait()
+        await asyncio.sleep(0)
+        self.delivered.mark()
+
+    async def send_bytes(self, data: bytes):
+        await self.send_text(data)
+
+class NullConnection:
+    """Stand-in for an order-entry client's outbound queue"""
+
+    def offer(self, payload: str):
+        pass
+
+class FanoutTracker:
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.count = 0
+        self.done = asyncio.Event()
+
+    def mark(self):
+        self.count += 1
+        if self.count >= self.expected:
+            self.done.set()
+
+async def _register(client, username: str) -> dict:
+    await client.post("/api/register", json={
+        "username": username, "email": f"{username}@bench.local", "password": "bench-password", "api_key": ""
+    })
+    response = await client.post("/api/login", json={"username": username, "password": "bench-password"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # Fund the account in the engine's ledger so resting orders never run into
+    # the pre-trade balance check however many the benchmark leaves on the book
+    from backend.api import trading as trading_api
+    from backend.matching_engine.ticks import to_cash
+    me = (await client.get("/api/me", headers=headers)).json()
+    trading_api.engine_singleton.engine.ledger.open_account(me["id"]).balance = to_cash(1e12)
+    return headers
+
+async def bench_order_entry(results: Results, count: int, concurrency_levels: List[int]):
+    """POST /api/trading/orders latency percentiles, sequential and concurrent"""
+    import httpx
+    from backend.app import app
+
+    async with app.router.lifespan_context(app):
+        # Keep per-order logging out of the measurement
+        from backend.api import trading as trading_api
+        trading_api.engine_singleton.engine.verbose = False
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            headers = [await _register(client, f"bench_{i}") for i in range(2)]
+
+            for concurrency in concurrency_levels:
+                samples = []
+
+                async def submit(i: int):
+                    # Each user alternates sides so balances stay roughly flat
+                    side = "buy" if i % 2 else "sell"
+                    # Prices straddle the mid so roughly half the orders trade
+                    price = round(50.0 + (i % 7 - 3) * 0.1, 1)
+                    start = time.perf_counter_ns()
+                    response = await client.post("/api/trading/orders", headers=headers[(i // 2) % 2], json={
+                        "symbol": "CQAF", "side": side, "order_type": "limit", "quantity": 1, "price": price
+                    })
+                    samples.append(time.perf_counter_ns() - start)
+                    if response.status_code != 201:
+                        raise RuntimeError(f"Order rejected: {response.status_code} {response.text}")
+
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def bounded(i: int):
+                    async with semaphore:
+                        await submit(i)
+
+                with Timer() as total:
+                    await asyncio.gather(*(bounded(i) for i in range(count)))
+                metrics = {"requests_per_sec": count / (total.elapsed_ns / 1e9)}
+                metrics.update(percentiles(samples))
+                results.add("api.post_order", {"concurrency": concurrency, "requests": count}, metrics)
+
+            # The same order flow through order-entry WebSocket sessions, timed
+            # from the message to its ack being queued (no socket framing)
+            from backend.api.order_entry import OrderEntrySession, authenticate
+            engine = trading_api.engine_singleton.engine
+            sessions = []
+            for header in headers:
+                user = await authenticate(header["Authorization"].split(" ", 1)[1])
+                sessions.append(OrderEntrySession(NullConnection(), user, engine))
+            samples = []
+            for i in range(count):
+                side = "buy" if i % 2 else "sell"
+                price = round(50.0 + (i % 7 - 3) * 0.1, 1)
+                start = time.perf_counter_ns()
+                await sessions[(i // 2) % 2].handle({
+                    "op": "new", "client_order_id": str(i), "symbol": "CQAF", "side": side,
+                    "order_type": "limit", "quantity": 1, "price": price
+                })
+                samples.append(time.perf_counter_ns() - start)
+            results.add("api.order_entry_session", {"requests": count}, percentiles(samples))
+            for session in sessions:
+                await session.close()
+
+            # Market-maker requotes: a resting ladder submitted in one request,
+            # then pulled with one batch cancel
+            batch_size = 20
+            submit_samples, cancel_samples = [], []
+            for _ in range(max(1, count // batch_size)):
+                ladder = [{"symbol": "CQAF", "side": "sell", "order_type": "limit", "quantity": 1,
+                           "price": round(60.0 + i * 0.1, 1)} for i in range(batch_size)]
+                start = time.perf_counter_ns()
+                response = await client.post("/api/trading/orders/batch", headers=headers[0], json={"orders": ladder})
+                submit_samples.append(time.perf_counter_ns() - start)
+                order_ids = [result["id"] for result in response.json() if result["error"] is None]
+                if len(order_ids) != batch_size:
+                    raise RuntimeError(f"Batch rejected: {response.status_code} {response.text}")
+                start = time.perf_counter_ns()
+                await client.post("/api/trading/orders/cancel", headers=headers[0], json={"order_ids": order_ids})
+                cancel_samples.append(time.perf_counter_ns() - start)
+            metrics = percentiles(submit_samples)
+            metrics["orders_per_sec"] = batch_size * len(submit_samples) / (sum(submit_samples) / 1e9)
+            results.add("api.post_order_batch", {"batch_size": batch_size}, metrics)
+            results.add("api.cancel_order_batch", {"batch_size": batch_size}, percentiles(cancel_samples))
+
+            # Reads against the book the order entry runs left behind
+            for name, path in (("api.get_orderbook", "/api/market/orderbook/CQAF?depth=10"),
+                               ("api.get_market_data", "/api/market/data/CQAF")):
+                samples = []
+                for _ in range(count):
+                    start = time.perf_counter_ns()
+                    response = await client.get(path)
+                    samples.append(time.perf_counter_ns() - start)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{path} failed: {response.status_code} {response.text}")
+                results.add(name, {"requests": count}, percentiles(samples))
+
+async def bench_login_burst(results: Results, burst_sizes: List[int]):
+    """Latency of N concurrent logins, and of one trader's order entry while they run"""
+    import httpx
+    from backend.app import app
+
+    async with app.router.lifespan_context(app):
+        from backend.api import trading as trading_api
+        from backend.api.auth import auth_api
+        trading_api.engine_singleton.engine.verbose = False
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            trader = await _register(client, "burst_trader")
+            await _register(client, "burst_login")
+
+            for burst in burst_sizes:
+                login_samples = []
+                order_samples = []
+                rejected_before = auth_api.password_hasher.rejected
+
+                async def login():
+                    start = time.perf_counter_ns()
+                    response = await client.post("/api/login", json={
+                        "username": "burst_login", "password": "bench-password"
+                    })
+                    if response.status_code == 200:
+                        login_samples.append(time.perf_counter_ns() - start)
+                    elif response.status_code != 503:
+                        raise RuntimeError(f"Login failed: {response.status_code} {response.text}")
+
+                async def trade_until(done: asyncio.Event):
+                    i = 0
+                    while not done.is_set():
+                        start = time.perf_counter_ns()
+                        response = await client.post("/api/trading/orders", headers=trader, json={
+                            "symbol": "CQAF", "side": "sell", "order_type": "limit",
+                            "quantity": 1, "price": round(90.0 + (i % 10) * 0.1, 1)
+                        })
+                        order_samples.append(time.perf_counter_ns() - start)
+                        if response.status_code != 201:
+                            raise RuntimeError(f"Order rejected: {response.status_code} {response.text}")
+                        i += 1
+
+                done = asyncio.Event()
+                trading = asyncio.create_task(trade_until(done))
+                with Timer() as total:
+                    await asyncio.gather(*(login() for _ in range(burst)))
+                done.set()
+                await trading
+
+                metrics = {
+                    "logins_per_sec": len(login_samples) / (total.elapsed_ns / 1e9),
+                    "rejected": auth_api.password_hasher.rejected - rejected_before
+                }
+                metrics.update(percentiles(login_samples))
+                results.add("api.login_burst", {"logins": burst}, metrics)
+                results.add("api.post_order_during_login_burst", {"logins": burst}, percentiles(order_samples))
+
+async def bench_broadcast(results: Results, client_counts: List[int], messages: int, stalled_clients: int = 0,
+                          symbols: int = 0):
+    """Time from broadcast() until every connected (non-stalled) client has received the message.
+
+    With ``symbols``, clients are spread over that many ``trades:<symbol>``
+    channels and the message is published to one of them.
+    """
+    from backend.websocket_manager import ConnectionManager
+
+    message = {"type": "trade", "symbol": "CQAF", "price": 50.0, "quantity": 1, "value": 50.0,
+               "timestamp": "2025-01-01T00:00:00"}
+    for clients in client_counts:
+        manager = ConnectionManager()
+        sockets = []
+        tracker = FanoutTracker(clients // symbols if symbols else clients)
+        for i in range(clients + stalled_clients):
+            websocket = FakeWebSocket(tracker, stalled=i >= clients)
+            await manager.connect(websocket)
+            if symbols:
+                manager.subscribe(websocket, f"trades:S{i % symbols}")
+            sockets.append(websocket)
+
+        samples = []
+        for _ in range(messages):
+            tracker.count = 0
+            tracker.done.clear()
+            start = time.perf_counter_ns()
+            if symbols:
+                await manager.publish("trades:S0", message)
+            else:
+                await manager.broadcast(message)
+            await tracker.done.wait()
+            samples.append(time.perf_counter_ns() - start)
+
+        for websocket in sockets:
+            manager.disconnect(websocket)
+        if symbols:
+            name, params = "ws.channel_fanout", {"clients": clients, "symbols": symbols}
+        elif stalled_clients:
+            name, params = "ws.broadcast_fanout_with_stalled_clients", {"clients": clients, "stalled": stalled_clients}
+        else:
+            name, params = "ws.broadcast_fanout", {"clients": clients}
+        results.add(name, params, percentiles(samples))
+
+def run(results: Results, quick: bool = False):
+    print("🌐 API and WebSocket benchmarks")
+    asyncio.run(bench_order_entry(results, count=200 if quick else 2_000, concurrency_levels=[1, 10]))
+    asyncio.run(bench_login_burst(results, [10, 50] if quick else [10, 50, 200]))
+    client_counts = [10, 100, 1_000] if quick else [10, 100, 1_000, 5_000]
+    asyncio.run(bench_broadcast(results, client_counts, messages=20 if quick else 200))
+    asyncio.run(bench_broadcast(results, [100], messages=20 if quick else 200, stalled_clients=10))
+    asyncio.run(bench_broadcast(results, [1_000], messages=20 if quick else 200, symbols=10))
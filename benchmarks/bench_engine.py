@@ -0,0 +1,135 @@
+"""
+Matching engine micro-benchmarks: add_order at different book depths, market
+sweeps, cancels and order book snapshots. The engine runs with in-memory
+persistence and logging off, so only matching logic is measured.
+"""
+
+import asyncio
+import random
+import time
+from typing import List
+
+from backend.models.models import OrderSide, OrderType, OrderStatus
+from backend.matching_engine.orders import EngineOrder
+from backend.matching_engine.engine import MatchingEngine
+from backend.matching_engine.persistence import InMemoryPersistence
+from benchmarks.common import Results, Timer, percentiles
+
+SYMBOL = "CQAF"
+# Prices are engine ticks (0.1 each at the default tick size), so MID is 50.0
+MID = 500
+
+class OrderFactory:
+    def __init__(self, seed: int = 42):
+        self.next_id = 1
+        self.random = random.Random(seed)
+
+    def make(self, side: OrderSide, price: int = None, quantity: int = 10,
+             order_type: OrderType = OrderType.LIMIT) -> EngineOrder:
+        order = EngineOrder(
+            id=self.next_id,
+            user_id=self.next_id % 100,
+            symbol=SYMBOL,
+            side=side,
+            order_type=order_type,
+            quantity=quantity,
+            price=price,
+            filled_quantity=0,
+            status=OrderStatus.PENDING
+        )
+        self.next_id += 1
+        return order
+
+    def passive(self, levels: int) -> EngineOrder:
+        """Random non-crossing limit order within ``levels`` ticks of the touch"""
+        side = self.random.choice([OrderSide.BUY, OrderSide.SELL])
+        offset = self.random.randint(1, levels)
+        price = MID - offset if side == OrderSide.BUY else MID + offset
+        return self.make(side, price)
+
+def new_engine() -> MatchingEngine:
+    return MatchingEngine([SYMBOL], persistence=InMemoryPersistence(lambda event: None), verbose=False)
+
+def prefill(engine: MatchingEngine, factory: OrderFactory, depth: int, levels: int = 500) -> List[EngineOrder]:
+    orders = [factory.passive(levels) for _ in range(depth)]
+    engine.restore_resting_orders(orders)
+    return orders
+
+async def bench_add_order(results: Results, depths: List[int], count: int):
+    """Throughput of resting (non-crossing) limit orders on a book of a given depth"""
+    for depth in depths:
+        factory = OrderFactory()
+        engine = new_engine()
+        prefill(engine, factory, depth)
+        orders = [factory.passive(500) for _ in range(count)]
+
+        samples = []
+        with Timer() as total:
+            for order in orders:
+                start = time.perf_counter_ns()
+                await engine.add_order(order)
+                samples.append(time.perf_counter_ns() - start)
+        metrics = {"ops_per_sec": count / (total.elapsed_ns / 1e9)}
+        metrics.update(percentiles(samples))
+        results.add("engine.add_order", {"depth": depth, "orders": count}, metrics)
+
+async def bench_market_sweep(results: Results, level_counts: List[int], orders_per_level: int, repeats: int):
+    """Cost of one market order that sweeps every level of the opposite side"""
+    for levels in level_counts:
+        samples = []
+        for _ in range(repeats):
+            factory = OrderFactory()
+            engine = new_engine()
+            engine.restore_resting_orders(
+                factory.make(OrderSide.SELL, MID + i)
+                for i in range(levels) for _ in range(orders_per_level)
+            )
+            sweep = factory.make(OrderSide.BUY, quantity=levels * orders_per_level * 10,
+                                 order_type=OrderType.MARKET)
+            with Timer() as t:
+                await engine.add_order(sweep)
+            samples.append(t.elapsed_ns)
+        metrics = percentiles(samples)
+        metrics["fills"] = levels * orders_per_level
+        results.add("engine.market_sweep", {"levels": levels, "orders_per_level": orders_per_level}, metrics)
+
+async def bench_cancel(results: Results, depths: List[int], count: int):
+    """Latency of cancelling random resting orders"""
+    for depth in depths:
+        factory = OrderFactory()
+        engine = new_engine()
+        resting = prefill(engine, factory, depth)
+        victims = factory.random.sample(resting, min(count, depth))
+
+        samples = []
+        for order in victims:
+            start = time.perf_counter_ns()
+            await engine.cancel_order(order.id)
+            samples.append(time.perf_counter_ns() - start)
+        metrics = {"ops_per_sec": len(samples) / (sum(samples) / 1e9)}
+        metrics.update(percentiles(samples))
+        results.add("engine.cancel_order", {"depth": depth}, metrics)
+
+def bench_snapshot(results: Results, depths: List[int], repeats: int):
+    """Latency of get_order_book_snapshot for a book of a given depth"""
+    for depth in depths:
+        factory = OrderFactory()
+        engine = new_engine()
+        prefill(engine, factory, depth)
+
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            engine.get_order_book_snapshot(SYMBOL)
+            samples.append(time.perf_counter_ns() - start)
+        results.add("engine.order_book_snapshot", {"depth": depth}, percentiles(samples))
+
+def run(results: Results, quick: bool = False):
+    print("⚙️ Matching engine benchmarks")
+    depths = [0, 1_000, 10_000] if quick else [0, 1_000, 10_000, 100_000]
+    count = 2_000 if quick else 20_000
+
+    asyncio.run(bench_add_order(results, depths, count))
+    asyncio.run(bench_market_sweep(results, [1, 10, 50], orders_per_level=5, repeats=5 if quick else 20))
+    asyncio.run(bench_cancel(results, [d for d in depths if d], count))
+    bench_snapshot(results, depths, repeats=200 if quick else 2_000)
@@ -0,0 +1,110 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+def isolate_storage() -> str:
+    """Point the backend at a throwaway database and journal.
+
+    Must run before anything imports ``backend``, since the database URL is
+    read at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix="quantx-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["JOURNAL_DIR"] = os.path.join(workdir, "journal")
+    return workdir
+
+def percentiles(samples_ns: List[int]) -> Dict[str, float]:
+    """Latency summary in microseconds"""
+    ordered = sorted(samples_ns)
+    n = len(ordered)
+
+    def pick(q: float) -> float:
+        return ordered[min(n - 1, int(q * n))] / 1000
+
+    return {
+        "count": n,
+        "mean_us": statistics.fmean(ordered) / 1000,
+        "p50_us": pick(0.50),
+        "p90_us": pick(0.90),
+        "p99_us": pick(0.99),
+        "max_us": ordered[-1] / 1000,
+    }
+
+class Timer:
+    """Context manager measuring elapsed wall time in nanoseconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ns = time.perf_counter_ns() - self.start
+
+class Results:
+    """Collects benchmark results and writes them as JSON"""
+
+    def __init__(self):
+        self.results: List[Dict] = []
+
+    def add(self, name: str, params: Dict, metrics: Dict):
+        self.results.append({"name": name, "params": params, "metrics": metrics})
+        shown = ", ".join(f"{k}={v:,.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items())
+        print(f"  {name} {params}: {shown}")
+
+    def to_dict(self) -> Dict:
+        return {"meta": _metadata(), "results": self.results}
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"📄 Results written to {path}")
+
+def _metadata() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+def _key(result: Dict) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+def compare(baseline_path: str, current: Dict, threshold: float = 0.10) -> List[str]:
+    """Print metric changes against a previous results file; returns regressions.
+
+    Metrics ending in ``_us`` or ``_ms`` are latencies (lower is better);
+    everything else except ``count`` is a throughput (higher is better).
+    """
+    with open(baseline_path) as f:
+        baseline = {_key(r): r["metrics"] for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n📊 Compared with {baseline_path}")
+    for result in current["results"]:
+        previous = baseline.get(_key(result))
+        if previous is None:
+            continue
+        for metric, value in result["metrics"].items():
+            old = previous.get(metric)
+            if metric == "count" or not old or not isinstance(value, (int, float)):
+                continue
+            change = (value - old) / old
+            lower_is_better = metric.endswith("_us") or metric.endswith("_ms")
+            worse = change > threshold if lower_is_better else change < -threshold
+            marker = "🔴" if worse else "  "
+            line = f"{marker} {_key(result)} {metric}: {old:,.2f} -> {value:,.2f} ({change:+.1%})"
+            print(line)
+            if worse:
+                regressions.append(line)
+    return regressions
@@ -6,6 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "requests",
+        "httpx",
         "websockets",
     ],
     author="QuantX",
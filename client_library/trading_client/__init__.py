@@ -0,0 +1,8 @@
+from .client import TradingClient
+from .async_client import AsyncTradingClient
+from .order_book import LocalOrderBook
+from .streaming import StreamingClient
+from .exceptions import (
+    ExchangeError, ExchangeConnectionError, ExchangeTimeoutError, APIError, OrderRejectedError,
+    AuthenticationError, NotFoundError, ValidationError, ServiceUnavailableError
+)
@@ -0,0 +1,199 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .exceptions import ExchangeConnectionError, ExchangeTimeoutError, error_for_status
+
+# Methods that can be sent again without risk of applying a change twice or
+# reporting a false failure. DELETE is left out: a cancel whose response was
+# lost succeeded, and sending it again is rejected because the order is gone.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT"}
+# Statuses the exchange returns before doing any work, so any request may be retried
+RETRY_ANY_STATUSES = {429, 503}
+# Statuses after which only idempotent requests are retried
+RETRY_IDEMPOTENT_STATUSES = {502, 504}
+
+class AsyncTradingClient:
+    """Asynchronous client for the exchange's REST API.
+
+    Requests share a pool of keep-alive connections (``max_connections``), and
+    at most ``max_concurrency`` are in flight at once (default: the pool size),
+    so a strategy can fire many orders or queries with ``asyncio.gather``
+    without opening a connection per call or flooding the exchange.
+
+    Errors raise the exceptions in ``trading_client.exceptions``. Requests
+    are retried with exponential backoff and jitter (``retries`` times, from
+    ``backoff`` seconds up to ``max_backoff``, or the server's ``Retry-After``)
+    when the exchange sheds load (429, 503) or the connection could not be
+    made. Read timeouts, dropped connections and 502/504 are only retried for
+    reads (GET), so an order is never submitted twice and a cancel that went
+    through is never reported as failed.
+
+    Use it as an async context manager, or call ``aclose`` when done::
+
+        async with AsyncTradingClient("http://127.0.0.1:8000") as client:
+            await client.login("user", "password")
+            await asyncio.gather(*(client.create_order("CQAF", "buy", "limit", 1, 49.0 + i * 0.1)
+                                   for i in range(10)))
+    """
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", token: Optional[str] = None,
+                 timeout: float = 10.0, max_connections: int = 20, max_concurrency: Optional[int] = None,
+                 retries: int = 3, backoff: float = 0.1, max_backoff: float = 2.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency or max_connections
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._http = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/api",
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+        if token:
+            self.set_token(token)
+
+    async def __aenter__(self) -> "AsyncTradingClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the pooled connections"""
+        await self._http.aclose()
+
+    def set_token(self, token: str):
+        """Use a JWT or API key for every following request"""
+        self._http.headers["Authorization"] = f"Bearer {token}"
+
+    async def login(self, username: str, password: str) -> Dict:
+        """Log in and use the returned token from now on; returns the token response"""
+        token = await self._request("POST", "/login", json={"username": username, "password": password})
+        self.set_token(token["access_token"])
+        return token
+
+    async def _request(self, method: str, path: str, params: Optional[Dict] = None, json: Any = None) -> Any:
+        idempotent = method in IDEMPOTENT_METHODS
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        if self._slots is None:
+            # Created on first use, inside the event loop that will run the requests
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self._slots:
+                    response = await self._http.request(method, path, params=params, json=json)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Nothing reached the exchange, so any request is safe to send again
+                if attempt >= self.retries:
+                    raise self._transport_error(e) from e
+            except httpx.TransportError as e:
+                if not idempotent or attempt >= self.retries:
+                    raise self._transport_error(e) from e
+            else:
+                if response.is_success:
+                    return response.json() if response.content else None
+                retry_after = _retry_after(response)
+                retryable = response.status_code in RETRY_ANY_STATUSES or \
+                    (idempotent and response.status_code in RETRY_IDEMPOTENT_STATUSES)
+                if not retryable or attempt >= self.retries:
+                    raise error_for_status(response.status_code, _detail(response), retry_after)
+            await asyncio.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+
+    def _delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _transport_error(error: httpx.TransportError) -> ExchangeConnectionError:
+        if isinstance(error, httpx.TimeoutException):
+            return ExchangeTimeoutError(f"Request timed out: {error!r}")
+        return ExchangeConnectionError(f"Request failed: {error!r}")
+
+    # Market Data
+    async def get_all_market_data(self) -> List[Dict]:
+        """Market data for all symbols"""
+        return await self._request("GET", "/market/data")
+
+    async def get_market_data(self, symbol: str) -> Dict:
+        return await self._request("GET", f"/market/data/{symbol.upper()}")
+
+    async def get_order_book(self, symbol: str, depth: Optional[int] = None) -> Dict:
+        """Price levels per side, ``depth`` deep (the whole book by default)"""
+        return await self._request("GET", f"/market/orderbook/{symbol.upper()}", params={"depth": depth})
+
+    async def get_recent_trades(self, symbol: str, limit: int = 50, before: Optional[int] = None) -> List[Dict]:
+        """Latest trades, newest first; pass the last trade id as ``before`` for the next page"""
+        return await self._request("GET", f"/market/trades/{symbol.upper()}",
+                                   params={"limit": limit, "before": before})
+
+    async def get_candles(self, symbol: str, interval: str = "1m", start: Optional[str] = None,
+                          end: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """OHLCV bars, oldest first; ``start`` and ``end`` are ISO timestamps in UTC"""
+        return await self._request("GET", f"/market/candles/{symbol.upper()}",
+                                   params={"interval": interval, "start": start, "end": end, "limit": limit})
+
+    # Account
+    async def get_account_balance(self) -> Dict:
+        return await self._request("GET", "/account/balance")
+
+    async def get_account_positions(self) -> List[Dict]:
+        return await self._request("GET", "/account/positions")
+
+    async def get_account_trades(self, limit: int = 100) -> List[Dict]:
+        return await self._request("GET", "/account/trades", params={"limit": limit})
+
+    async def get_account_orders(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        return await self._request("GET", "/account/orders", params={"status": status, "limit": limit})
+
+    # Trading
+    async def create_order(self, symbol: str, side: str, order_type: str, quantity: int,
+                           price: Optional[float] = None) -> Dict:
+        """Place an order; raises OrderRejectedError if the exchange refuses it"""
+        return await self._request("POST", "/trading/orders", json={
+            "symbol": symbol,
+            "side": side,
+            "order_type": order_type,
+            "quantity": quantity,
+            "price": price
+        })
+
+    async def create_orders(self, orders: List[Dict]) -> List[Dict]:
+        """Place several orders in one request; returns one result (``id``, ``status``, ``error``) per order"""
+        return await self._request("POST", "/trading/orders/batch", json={"orders": orders})
+
+    async def amend_order(self, order_id: int, price: Optional[float] = None, quantity: Optional[int] = None) -> Dict:
+        """Change the price and/or total quantity of a resting limit order"""
+        return await self._request("PATCH", f"/trading/orders/{order_id}", json={"price": price, "quantity": quantity})
+
+    async def cancel_order(self, order_id: int) -> Dict:
+        return await self._request("DELETE", f"/trading/orders/{order_id}")
+
+    async def cancel_orders(self, order_ids: List[int]) -> List[Dict]:
+        """Cancel several orders in one request, with one result per order id"""
+        return await self._request("POST", "/trading/orders/cancel", json={"order_ids": order_ids})
+
+    async def cancel_all_orders(self, symbol: Optional[str] = None) -> List[Dict]:
+        """Cancel all open orders, or only those in ``symbol``"""
+        return await self._request("DELETE", "/trading/orders", params={"symbol": symbol})
+
+def _detail(response: httpx.Response) -> Any:
+    try:
+        return response.json().get("detail", response.text)
+    except (ValueError, AttributeError):
+        return response.text
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
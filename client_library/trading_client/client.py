@@ -1,14 +1,15 @@
 import requests
 from typing import List, Dict, Optional, Callable
-import websockets
-import asyncio
 import threading
-import json
+
+from .order_book import LocalOrderBook
+from .streaming import StreamingClient
 
 class TradingClient:
     def __init__(self, base_url: str = "http://127.0.0.1:8000", token: Optional[str] = None):
         self.base_url = base_url
         self.session = requests.Session()
+        self.streams: List[StreamingClient] = []
         if token:
             self.set_token(token)
 
@@ -20,8 +21,8 @@ class TradingClient:
         """Logs in to the exchange and stores the token."""
         try:
             response = self.session.post(
-                f"{self.base_url}/api/auth/token",
-                data={"username": username, "password": password}
+                f"{self.base_url}/api/login",
+                json={"username": username, "password": password}
             )
             response.raise_for_status()
             token_data = response.json()
@@ -33,7 +34,7 @@ class TradingClient:
 
     def _request(self, method: str, endpoint: str, params: Optional[Dict] = None, data: Optional[Dict] = None) -> Dict:
         """Helper method to make requests to the API."""
-        url = f"{self.base_url}{endpoint}"
+        url = f"{self.base_url}/api{endpoint}"
         try:
             response = self.session.request(method, url, params=params, json=data)
             response.raise_for_status()  # Raise an exception for bad status codes
@@ -96,28 +97,57 @@ class TradingClient:
         """Cancels an open order."""
         return self._request("DELETE", f"/trading/orders/{order_id}")
 
+    def create_orders(self, orders: List[Dict]) -> List[Dict]:
+        """Creates several orders in one request.
+
+        Each order is a dict with the arguments of ``create_order``. Returns one
+        result (``id``, ``status``, ``error``) per order, in the same sequence.
+        """
+        return self._request("POST", "/trading/orders/batch", data={"orders": orders})
+
+    def cancel_orders(self, order_ids: List[int]) -> List[Dict]:
+        """Cancels several open orders in one request, with one result per order id."""
+        return self._request("POST", "/trading/orders/cancel", data={"order_ids": order_ids})
+
+    def cancel_all_orders(self, symbol: Optional[str] = None) -> List[Dict]:
+        """Cancels all open orders, or only those in ``symbol``."""
+        params = {"symbol": symbol} if symbol else None
+        return self._request("DELETE", "/trading/orders", params=params)
+
     # WebSocket Methods
-    def start_websocket(self, message_handler: Callable[[Dict], None]):
-        """Starts a WebSocket client to receive real-time updates."""
-        ws_url = self.base_url.replace("http", "ws") + "/ws"
-        
-        def run_loop():
-            asyncio.run(self._ws_handler(ws_url, message_handler))
-
-        ws_thread = threading.Thread(target=run_loop, daemon=True)
-        ws_thread.start()
-        print(f"WebSocket client started, connected to {ws_url}")
-
-    async def _ws_handler(self, ws_url: str, message_handler: Callable[[Dict], None]):
-        """Handles the WebSocket connection and message receiving."""
-        try:
-            async with websockets.connect(ws_url) as websocket:
-                while True:
-                    message = await websocket.recv()
-                    data = json.loads(message)
-                    message_handler(data)
-        except Exception as e:
-            print(f"WebSocket error: {e}")
+    def start_websocket(self, message_handler: Callable[[Dict], None], channels: Optional[List[str]] = None,
+                        **options) -> StreamingClient:
+        """Starts a managed WebSocket stream to receive real-time updates.
+
+        ``channels`` (e.g. ``["trades:CQAF", "book:CQAF"]``) selects the feeds,
+        CQAF trades by default. The stream reconnects and resubscribes on its
+        own; ``options`` are passed to StreamingClient. Stop it with
+        ``stop_streams`` or the returned stream's ``stop``.
+        """
+        stream = StreamingClient(self.base_url, channels or ["trades:CQAF"], on_message=message_handler, **options)
+        self.streams.append(stream.start())
+        print(f"WebSocket client started, connected to {stream.ws_url}")
+        return stream
+
+    def start_order_book(self, symbol: str, on_update: Optional[Callable[[LocalOrderBook], None]] = None,
+                         **options) -> LocalOrderBook:
+        """Keeps a LocalOrderBook of ``symbol`` current from the WebSocket feed, in a background thread.
+
+        The book resynchronises itself from a fresh snapshot whenever it
+        detects missed updates or the stream reconnects. ``on_update`` is
+        called with the book after changes applied while it is in sync. Use
+        ``book.wait_synced()`` to wait for the first snapshot.
+        """
+        stream = StreamingClient(self.base_url, **options)
+        book = stream.order_book(symbol, on_update)
+        self.streams.append(stream.start())
+        return book
+
+    def stop_streams(self):
+        """Stops every stream started by this client"""
+        for stream in self.streams:
+            stream.stop()
+        self.streams.clear()
 
 if __name__ == '__main__':
     # Example usage:
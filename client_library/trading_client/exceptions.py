@@ -0,0 +1,48 @@
+from typing import Any, Optional
+
+class ExchangeError(Exception):
+    """Base class for every error raised by the exchange clients."""
+
+class ExchangeConnectionError(ExchangeError):
+    """The request could not be completed: connection refused or dropped, or it timed out."""
+
+class ExchangeTimeoutError(ExchangeConnectionError):
+    """The exchange did not answer within the client's timeout."""
+
+class APIError(ExchangeError):
+    """The exchange answered with an error status."""
+
+    def __init__(self, status_code: int, detail: Any = None, retry_after: Optional[float] = None):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(f"{status_code}: {detail}")
+
+class OrderRejectedError(APIError):
+    """400: the request was refused, e.g. an order that failed validation or pre-trade risk."""
+
+class AuthenticationError(APIError):
+    """401 or 403: missing, invalid or expired credentials."""
+
+class NotFoundError(APIError):
+    """404: no such order, symbol or endpoint."""
+
+class ValidationError(APIError):
+    """422: the request body or parameters did not match the API's schema."""
+
+class ServiceUnavailableError(APIError):
+    """429 or 503: the exchange is shedding load; ``retry_after`` says when to try again."""
+
+_STATUS_ERRORS = {
+    400: OrderRejectedError,
+    401: AuthenticationError,
+    403: AuthenticationError,
+    404: NotFoundError,
+    422: ValidationError,
+    429: ServiceUnavailableError,
+    503: ServiceUnavailableError,
+}
+
+def error_for_status(status_code: int, detail: Any = None, retry_after: Optional[float] = None) -> APIError:
+    """The most specific APIError for an HTTP status"""
+    return _STATUS_ERRORS.get(status_code, APIError)(status_code, detail, retry_after)
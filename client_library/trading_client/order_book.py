@@ -0,0 +1,184 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+# (price, quantity, order count)
+Level = Tuple[float, int, int]
+
+class BookSide:
+    """Price levels of one side, kept sorted so the best price is read in O(1)"""
+    __slots__ = ("levels", "prices", "descending")
+
+    def __init__(self, descending: bool):
+        self.levels: Dict[float, Tuple[int, int]] = {}
+        self.prices: List[float] = []  # ascending
+        self.descending = descending
+
+    def set(self, price: float, quantity: int, count: int):
+        """Set a level's absolute totals; quantity 0 removes it"""
+        if quantity <= 0:
+            if self.levels.pop(price, None) is not None:
+                del self.prices[bisect_left(self.prices, price)]
+            return
+        if price not in self.levels:
+            insort(self.prices, price)
+        self.levels[price] = (quantity, count)
+
+    def clear(self):
+        self.levels.clear()
+        self.prices.clear()
+
+    @property
+    def best(self) -> Optional[float]:
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.descending else self.prices[0]
+
+    def top(self, n: int) -> List[Level]:
+        """The best ``n`` levels, best first"""
+        if n <= 0:
+            return []
+        prices = reversed(self.prices[-n:]) if self.descending else self.prices[:n]
+        return [(price, *self.levels[price]) for price in prices]
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+def _level(entry: Union[Sequence, Dict]) -> Level:
+    """A level from a WebSocket ``[price, quantity, count]`` triple or a REST ``{price, quantity, orders}`` dict"""
+    if isinstance(entry, dict):
+        return entry["price"], entry["quantity"], entry.get("orders", 0)
+    return entry[0], entry[1], entry[2]
+
+class LocalOrderBook:
+    """Client-side mirror of one symbol's level-2 book, kept current from the WebSocket feed.
+
+    Feed it every message from a ``book:<symbol>`` subscription with
+    ``handle``. The book loads a ``book_snapshot`` (or a REST order book
+    response, which carries the same ``seq``), then applies each
+    ``book_delta`` whose ``seq`` follows the last one. Deltas that arrive
+    before the first snapshot are held back and applied on top of it.
+
+    When a delta skips a sequence number, updates were lost: the book stops
+    applying deltas (``synced`` becomes False) and ``handle`` returns True,
+    telling the caller to request a fresh snapshot (``{"op": "snapshot"}``
+    on the socket). ``StreamingClient.order_book`` and
+    ``TradingClient.start_order_book`` do all of this.
+
+    Best bid and ask are O(1) and ``depth(n)`` is O(n). Reads and updates
+    are guarded by a lock, so a feed thread can update the book while a
+    strategy thread reads it. Hold the lock with ``with book:`` to make
+    several reads from the same state of the book.
+    """
+
+    def __init__(self, symbol: str, max_pending: int = 10000):
+        self.symbol = symbol.upper()
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.seq: Optional[int] = None
+        self.synced = False
+        self.gaps = 0
+        self._pending: Deque[Dict] = deque(maxlen=max_pending)
+        self._lock = threading.RLock()
+        self._synced_event = threading.Event()
+
+    def __enter__(self) -> "LocalOrderBook":
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def handle(self, message: Dict) -> bool:
+        """Apply a feed message if it is a snapshot or delta of this book.
+
+        Returns True when a sequence gap was found and a new snapshot is needed.
+        """
+        kind = message.get("type")
+        if kind not in ("book_snapshot", "book_delta") or message.get("symbol") != self.symbol:
+            return False
+        with self._lock:
+            if kind == "book_snapshot":
+                return self.apply_snapshot(message)
+            return self.apply_delta(message)
+
+    def apply_snapshot(self, snapshot: Dict) -> bool:
+        """Replace the book with a snapshot, then apply the held-back deltas that follow it.
+
+        Returns True if those deltas do not follow on from the snapshot.
+        """
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for entry in snapshot["bids"]:
+                self.bids.set(*_level(entry))
+            for entry in snapshot["asks"]:
+                self.asks.set(*_level(entry))
+            self.seq = snapshot["seq"]
+            self.synced = True
+            pending, self._pending = list(self._pending), deque(maxlen=self._pending.maxlen)
+            for delta in pending:
+                if self.apply_delta(delta):
+                    return True
+            self._synced_event.set()
+            return False
+
+    def apply_delta(self, delta: Dict) -> bool:
+        """Apply one delta; returns True if it revealed a gap and a new snapshot is needed"""
+        with self._lock:
+            if not self.synced:
+                self._pending.append(delta)
+                return False
+            seq = delta["seq"]
+            if seq <= self.seq:
+                # Already reflected in the snapshot
+                return False
+            if seq != self.seq + 1:
+                self.gaps += 1
+                self.invalidate()
+                self._pending.append(delta)
+                return True
+            for entry in delta["bids"]:
+                self.bids.set(*_level(entry))
+            for entry in delta["asks"]:
+                self.asks.set(*_level(entry))
+            self.seq = seq
+            return False
+
+    def invalidate(self):
+        """Stop trusting the book until the next snapshot, e.g. after the feed disconnects"""
+        with self._lock:
+            self.synced = False
+            self._synced_event.clear()
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        """Block until the book has loaded a snapshot; False on timeout"""
+        return self._synced_event.wait(timeout)
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        with self._lock:
+            return self.bids.best
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        with self._lock:
+            return self.asks.best
+
+    @property
+    def spread(self) -> Optional[float]:
+        with self._lock:
+            bid, ask = self.bids.best, self.asks.best
+            return ask - bid if bid is not None and ask is not None else None
+
+    @property
+    def mid(self) -> Optional[float]:
+        with self._lock:
+            bid, ask = self.bids.best, self.asks.best
+            return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def depth(self, levels: int = 10) -> Dict[str, List[Level]]:
+        """The top ``levels`` price levels per side as ``(price, quantity, order count)``, best first"""
+        with self._lock:
+            return {"bids": self.bids.top(levels), "asks": self.asks.top(levels)}
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Set, Tuple
+
+import websockets
+
+from .order_book import LocalOrderBook
+
+def normalize_channel(channel: str) -> str:
+    """``book:cqaf`` -> ``book:CQAF``, the form the exchange uses"""
+    parts = channel.split(":")
+    if len(parts) > 1:
+        parts[1] = parts[1].upper()
+    return ":".join(parts)
+
+class StreamingClient:
+    """Managed WebSocket market data connection.
+
+    A network thread holds the connection and reconnects with exponential
+    backoff and jitter (``reconnect_backoff`` up to ``max_backoff`` seconds)
+    whenever it drops, resubscribing to every channel subscribed so far.
+    WebSocket pings every ``ping_interval`` seconds detect a dead connection
+    that never closed; no pong within ``ping_timeout`` forces a reconnect.
+
+    Messages are handed to ``on_message`` on a separate dispatcher thread
+    through a bounded queue (``max_queue_size``), so a slow callback never
+    stalls the socket. When the queue is full the oldest message is dropped
+    and counted. Order books from ``order_book`` are updated on the network
+    thread, resynchronised after reconnects and sequence gaps, and their
+    ``on_update`` callbacks are coalesced: a callback sees the latest book,
+    never a backlog. The network thread keeps updating the book while a
+    callback runs; each read is consistent on its own, and a callback that
+    reads several values (say best bid and best ask) should do so inside
+    ``with book:`` to see them from the same update.
+
+    ``stop`` closes the connection and ends both threads; ``metrics`` reports
+    connection state, reconnects and dropped messages.
+    """
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", channels: Iterable[str] = (),
+                 on_message: Optional[Callable[[Dict], None]] = None, max_queue_size: int = 10000,
+                 reconnect_backoff: float = 0.5, max_backoff: float = 30.0,
+                 ping_interval: float = 20.0, ping_timeout: float = 10.0, open_timeout: float = 10.0):
+        self.ws_url = base_url.replace("http", "ws", 1).rstrip("/") + "/ws"
+        self.channels: Set[str] = {normalize_channel(channel) for channel in channels}
+        self.on_message = on_message
+        self.max_queue_size = max_queue_size
+        self.reconnect_backoff = reconnect_backoff
+        self.max_backoff = max_backoff
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.open_timeout = open_timeout
+        self.books: Dict[str, LocalOrderBook] = {}
+        self._book_callbacks: Dict[str, Callable[[LocalOrderBook], None]] = {}
+        self._books_pending: Set[str] = set()
+
+        self._queue: Deque[Tuple[Callable[[Any], None], Any]] = deque()
+        self._ready = threading.Condition()
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._websocket = None
+        self._network_thread: Optional[threading.Thread] = None
+        self._dispatch_thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+        self.connected = False
+        self.connects = 0
+        self.reconnects = 0
+        self.messages_received = 0
+        self.messages_dropped = 0
+        self.callback_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_message_at: Optional[float] = None
+
+    def start(self) -> "StreamingClient":
+        """Start the network and dispatcher threads"""
+        if self._network_thread is not None:
+            return self
+        self._network_thread = threading.Thread(target=self._run_network, name="stream-network", daemon=True)
+        self._dispatch_thread = threading.Thread(target=self._run_dispatch, name="stream-dispatch", daemon=True)
+        self._network_thread.start()
+        self._dispatch_thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Close the connection and stop both threads"""
+        self._stopping = True
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        with self._ready:
+            self._ready.notify_all()
+        for thread in (self._network_thread, self._dispatch_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def __enter__(self) -> "StreamingClient":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Subscriptions
+    def subscribe(self, channels: Iterable[str]):
+        """Add channels; they are also resubscribed after every reconnect"""
+        added = [channel for channel in map(normalize_channel, channels) if channel not in self.channels]
+        self.channels.update(added)
+        if added:
+            self._send({"op": "subscribe", "channels": added})
+
+    def unsubscribe(self, channels: Iterable[str]):
+        removed = [channel for channel in map(normalize_channel, channels) if channel in self.channels]
+        self.channels.difference_update(removed)
+        if removed:
+            self._send({"op": "unsubscribe", "channels": removed})
+
+    def order_book(self, symbol: str, on_update: Optional[Callable[[LocalOrderBook], None]] = None) -> LocalOrderBook:
+        """A LocalOrderBook for ``symbol`` kept current from its ``book`` channel"""
+        symbol = symbol.upper()
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LocalOrderBook(symbol)
+        if on_update is not None:
+            self._book_callbacks[symbol] = on_update
+        self.subscribe([f"book:{symbol}"])
+        return book
+
+    def _send(self, message: Dict):
+        """Send from any thread if connected; otherwise the next connection picks up ``channels``"""
+        loop, websocket = self._loop, self._websocket
+        if loop is not None and websocket is not None:
+            asyncio.run_coroutine_threadsafe(self._send_quietly(websocket, json.dumps(message)), loop)
+
+    @staticmethod
+    async def _send_quietly(websocket, payload: str):
+        try:
+            await websocket.send(payload)
+        except websockets.ConnectionClosed:
+            # The reconnect resubscribes from ``channels``
+            pass
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "messages_received": self.messages_received,
+            "messages_dropped": self.messages_dropped,
+            "callback_errors": self.callback_errors,
+            "queue_size": len(self._queue),
+            "book_resyncs": sum(book.gaps for book in self.books.values()),
+            "last_message_age": time.monotonic() - self.last_message_at if self.last_message_at else None,
+            "last_error": self.last_error,
+        }
+
+    # Network thread
+    def _run_network(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self._maintain_connection())
+            self._started.set()
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._started.set()
+            self._loop.close()
+
+    async def _maintain_connection(self):
+        attempt = 0
+        while not self._stopping:
+            url = f"{self.ws_url}?channels={','.join(sorted(self.channels))}"
+            try:
+                async with websockets.connect(url, ping_interval=self.ping_interval, ping_timeout=self.ping_timeout,
+                                              open_timeout=self.open_timeout) as websocket:
+                    self._websocket = websocket
+                    self.connected = True
+                    if self.connects:
+                        self.reconnects += 1
+                    self.connects += 1
+                    attempt = 0
+                    async for raw in websocket:
+                        await self._receive(websocket, raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = repr(e)
+            finally:
+                self._websocket = None
+                self.connected = False
+                # Updates were missed while disconnected; resubscribing brings fresh snapshots
+                for book in self.books.values():
+                    book.invalidate()
+            if self._stopping:
+                break
+            delay = min(self.max_backoff, self.reconnect_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _receive(self, websocket, raw: str):
+        self.messages_received += 1
+        self.last_message_at = time.monotonic()
+        message = json.loads(raw)
+        book = self.books.get(message.get("symbol")) if message.get("type") in ("book_snapshot", "book_delta") else None
+        if book is not None:
+            if book.handle(message):
+                await websocket.send(json.dumps({"op": "snapshot", "symbol": book.symbol}))
+            elif book.synced and book.symbol in self._book_callbacks:
+                self._enqueue_book_update(book.symbol)
+        if self.on_message is not None:
+            self._enqueue(self.on_message, message)
+
+    # Dispatcher thread
+    def _enqueue(self, callback: Callable[[Any], None], argument: Any):
+        with self._ready:
+            if len(self._queue) >= self.max_queue_size:
+                dropped, dropped_argument = self._queue.popleft()
+                self.messages_dropped += 1
+                if dropped == self._book_updated:
+                    # Let the book's next update queue a callback again
+                    self._books_pending.discard(dropped_argument)
+            self._queue.append((callback, argument))
+            self._ready.notify()
+
+    def _enqueue_book_update(self, symbol: str):
+        # One pending callback per book: it reads the book when it runs
+        with self._ready:
+            if symbol in self._books_pending:
+                return
+            self._books_pending.add(symbol)
+        self._enqueue(self._book_updated, symbol)
+
+    def _book_updated(self, symbol: str):
+        with self._ready:
+            self._books_pending.discard(symbol)
+        self._book_callbacks[symbol](self.books[symbol])
+
+    def _run_dispatch(self):
+        while True:
+            with self._ready:
+                while not self._queue and not self._stopping:
+                    self._ready.wait()
+                if self._stopping:
+                    return
+                callback, argument = self._queue.popleft()
+            try:
+                callback(argument)
+            except Exception as e:
+                self.callback_errors += 1
+                print(f"Stream callback error: {e!r}")
@@ -3,15 +3,13 @@ import getpass
 import secrets
 import sys
 import os
-from passlib.context import CryptContext
 
 # Add project root to path to allow importing backend modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.models.database import SessionLocal
 from backend.models.models import User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.api.password_hashing import hash_password
 
 def create_user(db_session, username, email, password):
     """Creates a new user in the database."""
@@ -23,13 +21,13 @@ def create_user(db_session, username, email, password):
         print(f"Error: Email '{email}' is already in use.")
         return
 
-    # Hash password
-    password_hash = pwd_context.hash(password)
+    # Hash password the same way the API does, so the user can log in
+    password_hash = hash_password(password)
 
-    # Generate API key and secret
-    api_key = f"qk_{secrets.token_urlsafe(16)}"
+    # Generate API key and secret (the API only accepts keys with the cqaf_ prefix)
+    api_key = f"cqaf_{secrets.token_urlsafe(32)}"
     api_secret = secrets.token_urlsafe(32)
-    api_secret_hash = pwd_context.hash(api_secret)
+    api_secret_hash = hash_password(api_secret)
 
     # Create new user
     new_user = User(